@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.signals import request_started
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from .db import check_connections
+        if settings.DB_CONN_HEALTH_CHECKS:
+            request_started.connect(check_connections)
@@ -0,0 +1,131 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+POOL_MODES = ('', 'pgbouncer')
+PRIMARY_PIN_KEY = 'db:primary:{}'
+# Состояние текущего запроса: None — чтение с основной БД, READ — с реплик,
+# WRITTEN — в запросе уже была запись, чтение снова с основной БД.
+READ, WRITTEN = 'read', 'written'
+replica_state = ContextVar('replica_state', default=None)
+
+
+def check_connections(**kwargs):
+    """Закрывает постоянные соединения, которые перестали отвечать.
+
+    Вызывается в начале запроса, поэтому оборванное соединение
+    переоткрывается до выполнения запросов, а не приводит к ошибке.
+    """
+    for connection in connections.all():
+        if connection.connection is not None and not connection.is_usable():
+            connection.close()
+
+
+class ReplicaRouter:
+    """Направляет чтение на реплики из DATABASE_REPLICAS.
+
+    Реплики используются только внутри read_from_replicas(); после
+    первой записи в запросе чтение до его конца идёт с основной БД.
+    """
+
+    def db_for_read(self, model, **hints):
+        if replica_state.get() == READ and settings.DATABASE_REPLICAS:
+            return random.choice(settings.DATABASE_REPLICAS)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        if replica_state.get() == READ:
+            replica_state.set(WRITTEN)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def read_from_replicas(user):
+    """Включает чтение с реплик, если пользователь не закреплён за БД.
+
+    Возвращает токен для stop_reading_from_replicas().
+    """
+    if not settings.DATABASE_REPLICAS or is_pinned_to_primary(user):
+        return replica_state.set(None)
+    return replica_state.set(READ)
+
+
+def stop_reading_from_replicas(token):
+    """Восстанавливает состояние; возвращает True, если была запись."""
+    written = replica_state.get() == WRITTEN
+    replica_state.reset(token)
+    return written
+
+
+def pin_to_primary(user):
+    """Закрепляет пользователя за основной БД после записи.
+
+    DB_REPLICA_PIN_SECONDS секунд его запросы читают с основной БД и
+    видят собственные изменения независимо от отставания реплик.
+    """
+    if settings.DATABASE_REPLICAS and user.is_authenticated:
+        cache.set(
+            PRIMARY_PIN_KEY.format(user.pk), True,
+            settings.DB_REPLICA_PIN_SECONDS)
+
+
+@contextmanager
+def read_from_primary():
+    """Чтение с основной БД, например для заполнения кэша."""
+    token = replica_state.set(None)
+    try:
+        yield
+    finally:
+        replica_state.reset(token)
+
+
+def is_pinned_to_primary(user):
+    return user.is_authenticated and cache.get(
+        PRIMARY_PIN_KEY.format(user.pk), False)
+
+
+@checks.register('database_pool')
+def database_pool_check(app_configs, **kwargs):
+    """Проверяет настройки пула соединений с БД."""
+    messages = []
+    if settings.DB_POOL_MODE not in POOL_MODES:
+        messages.append(checks.Error(
+            f'Неизвестный режим DB_POOL_MODE: {settings.DB_POOL_MODE}',
+            hint=f'Допустимые значения: {", ".join(POOL_MODES[1:])}',
+            id='api.E001',
+        ))
+    for alias, config in settings.DATABASES.items():
+        if (settings.DB_POOL_MODE == 'pgbouncer'
+                and not config.get('DISABLE_SERVER_SIDE_CURSORS')):
+            messages.append(checks.Warning(
+                f'БД {alias}: серверные курсоры несовместимы с pgbouncer '
+                'в режиме transaction',
+                hint='Установите DISABLE_SERVER_SIDE_CURSORS=True',
+                id='api.W001',
+            ))
+    return messages
+
+
+@checks.register('database_pool')
+def database_pool_report(app_configs, **kwargs):
+    """Выводит настройки соединений с БД при проверке перед запуском."""
+    return [
+        checks.Info(
+            f'БД {alias}: CONN_MAX_AGE={config.get("CONN_MAX_AGE", 0)}, '
+            f'проверка соединений '
+            f'{"включена" if settings.DB_CONN_HEALTH_CHECKS else "выключена"}'
+            f', режим пула: {settings.DB_POOL_MODE or "без пула"}',
+            id='api.I001',
+        )
+        for alias, config in settings.DATABASES.items()
+    ]
@@ -0,0 +1,93 @@
+import csv
+from datetime import datetime
+
+import orjson
+from api.utils import Echo
+from django.conf import settings
+from django.db.models import Q
+from recipes.models import Favorite, Ingredient, IngredientRecipe, Recipes
+from users.models import Subscriber
+
+# Набор данных: модель, выгружаемые поля и поле даты для отметки since.
+DATASETS = {
+    'recipes': (
+        Recipes,
+        ('id', 'author_id', 'name', 'text', 'cooking_time', 'pub_date',
+         'favorites_count'),
+        'pub_date',
+    ),
+    'recipe_ingredients': (
+        IngredientRecipe, ('id', 'recipe_id', 'ingredient_id', 'amount'),
+        None,
+    ),
+    'recipe_tags': (
+        Recipes.tags.through, ('id', 'recipes_id', 'tags_id'), None,
+    ),
+    'ingredients': (Ingredient, ('id', 'name', 'measurement_unit'), None),
+    'favorites': (Favorite, ('id', 'author_id', 'recipe_id'), None),
+    'subscriptions': (Subscriber, ('id', 'user_id', 'author_id'), None),
+}
+
+
+def export_queryset(name, since=None, after_id=None):
+    """Строки набора данных после отметки, в порядке выгрузки.
+
+    Отметка — последняя выгруженная строка: дата (since) и id
+    (after_id) для рецептов, только id для остальных наборов.
+    """
+    model, fields, date_field = DATASETS[name]
+    queryset = model._default_manager.all()
+    order = ('id',)
+    if date_field:
+        order = (date_field, 'id')
+        if since is not None:
+            queryset = queryset.filter(
+                Q(**{f'{date_field}__gt': since})
+                | Q(**{date_field: since, 'id__gt': after_id or 0}))
+    if after_id is not None and not (date_field and since is not None):
+        queryset = queryset.filter(id__gt=after_id)
+    return queryset.order_by(*order).values_list(*fields)
+
+
+def export_rows(name, using=None, since=None, after_id=None):
+    """Строки набора данных порциями по EXPORT_CHUNK_SIZE.
+
+    Каждая порция читается отдельным запросом после последней строки
+    предыдущей, поэтому память не зависит от объёма выгрузки и без
+    серверных курсоров (при pgbouncer они отключены).
+    """
+    fields, date_field = DATASETS[name][1:]
+    while True:
+        queryset = export_queryset(name, since, after_id)
+        if using is not None:
+            queryset = queryset.using(using)
+        rows = list(queryset[:settings.EXPORT_CHUNK_SIZE])
+        yield from rows
+        if len(rows) < settings.EXPORT_CHUNK_SIZE:
+            return
+        last = dict(zip(fields, rows[-1]))
+        after_id = last['id']
+        if date_field:
+            since = last[date_field]
+
+
+def export_jsonl(name, rows):
+    """Построчно отдаёт набор данных в формате JSON Lines."""
+    fields = DATASETS[name][1]
+    for row in rows:
+        yield orjson.dumps(
+            dict(zip(fields, row)), option=orjson.OPT_APPEND_NEWLINE)
+
+
+def export_csv(name, rows):
+    """Построчно отдаёт набор данных в формате CSV с заголовком."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(DATASETS[name][1]).encode()
+    for row in rows:
+        yield writer.writerow([
+            value.isoformat() if isinstance(value, datetime) else value
+            for value in row
+        ]).encode()
+
+
+EXPORTERS = {'jsonl': export_jsonl, 'csv': export_csv}
@@ -1,17 +1,29 @@
 from django.contrib.auth import get_user_model
+from django.db.models import Case, IntegerField, Value, When
 from django_filters.rest_framework import FilterSet, filters
 from recipes.models import Ingredient, Recipes, Tags
+from recipes.search import search_recipes
 
 User = get_user_model()
 
 
 class IngredientFilter(FilterSet):
-    name = filters.CharFilter(lookup_expr='startswith')
+    name = filters.CharFilter(method='filter_name')
 
     class Meta:
         model = Ingredient
         fields = ('name', )
 
+    def filter_name(self, queryset, name, value):
+        """Поиск без учёта регистра: сначала по началу названия."""
+        return queryset.filter(name__icontains=value).annotate(
+            is_prefix=Case(
+                When(name__istartswith=value, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField(),
+            )
+        ).order_by('is_prefix', 'name')
+
 
 class RecipeFilter(FilterSet):
 
@@ -27,6 +39,10 @@ class RecipeFilter(FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart'
     )
+    search = filters.CharFilter(method='filter_search')
+    ordering = filters.OrderingFilter(
+        fields=(('favorites_count', 'popular'), ('pub_date', 'pub_date')),
+    )
 
     class Meta:
         model = Recipes
@@ -35,11 +51,15 @@ class RecipeFilter(FilterSet):
     def filter_is_favorited(self, queryset, name, value):
         user = self.request.user
         if value and not user.is_anonymous:
-            return queryset.filter(favorite__author=user)
+            return queryset.filter(is_favorited=True)
         return queryset
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         user = self.request.user
         if value and not user.is_anonymous:
-            return queryset.filter(shop__author=user)
+            return queryset.filter(is_in_shopping_cart=True)
         return queryset
+
+    def filter_search(self, queryset, name, value):
+        """Поиск по названию, описанию и ингредиентам с ранжированием."""
+        return search_recipes(queryset, value)
@@ -0,0 +1,209 @@
+import json
+import statistics
+import time
+import tracemalloc
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import (CaptureQueriesContext,
+                               setup_test_environment,
+                               teardown_test_environment)
+from recipes.models import Ingredient, Recipes, Tags
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.models import Subscriber, User
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def get_endpoints(user):
+    """Запросы ко всем эндпоинтам из api/urls.py.
+
+    Каждый элемент: имя, запрос (метод, адрес и тело) и необязательные
+    подготовительный и отменяющий запросы, которые не замеряются и
+    возвращают данные в исходное состояние после каждой итерации.
+    """
+    recipe = Recipes.objects.exclude(author=user).exclude(
+        favorite__author=user).exclude(shop__author=user).first()
+    own_recipe = Recipes.objects.filter(author=user).first()
+    author = User.objects.exclude(pk=user.pk).exclude(
+        following__user=user).first()
+    ingredient = Ingredient.objects.first()
+    tag = Tags.objects.first()
+    favorite = f'/api/recipes/{recipe.id}/favorite/'
+    cart = f'/api/recipes/{recipe.id}/shopping_cart/'
+    subscribe = f'/api/users/{author.id}/subscribe/'
+    favorite_bulk = '/api/recipes/favorite/'
+    cart_bulk = '/api/recipes/shopping_cart/'
+    bulk = {'recipes': list(Recipes.objects.exclude(author=user).exclude(
+        favorite__author=user).exclude(shop__author=user).values_list(
+        'id', flat=True)[:20])}
+    endpoints = [
+        ('recipes list', ('get', '/api/recipes/')),
+        ('recipes list limit=50', ('get', '/api/recipes/?limit=50')),
+        ('recipes list cursor', ('get', '/api/recipes/?pagination=cursor')),
+        ('recipes favorited', ('get', '/api/recipes/?is_favorited=1')),
+        ('recipes in cart', ('get', '/api/recipes/?is_in_shopping_cart=1')),
+        ('recipes by tag', ('get', f'/api/recipes/?tags={tag.slug}')),
+        ('recipe detail', ('get', f'/api/recipes/{recipe.id}/')),
+        ('shopping cart txt', ('get', '/api/recipes/download_shopping_cart/')),
+        ('recipes feed', ('get', '/api/recipes/feed/')),
+        ('recipes search', ('get', '/api/recipes/?search=суп')),
+        ('recipes match',
+         ('get', f'/api/recipes/match/?ingredients={ingredient.id}')),
+        ('shopping cart totals',
+         ('get', '/api/recipes/shopping_cart_totals/')),
+        ('ingredients list', ('get', '/api/ingredients/')),
+        ('ingredients search',
+         ('get', f'/api/ingredients/?name={ingredient.name[:2]}')),
+        ('ingredient detail', ('get', f'/api/ingredients/{ingredient.id}/')),
+        ('tags list', ('get', '/api/tags/')),
+        ('tag detail', ('get', f'/api/tags/{tag.id}/')),
+        ('users list', ('get', '/api/users/')),
+        ('user detail', ('get', f'/api/users/{author.id}/')),
+        ('users me', ('get', '/api/users/me/')),
+        ('subscriptions', ('get', '/api/users/subscriptions/')),
+        ('subscriptions recipes_limit=3',
+         ('get', '/api/users/subscriptions/?recipes_limit=3')),
+        ('favorite add', ('post', favorite), None, ('delete', favorite)),
+        ('favorite remove', ('delete', favorite), ('post', favorite), None),
+        ('cart add', ('post', cart), None, ('delete', cart)),
+        ('cart remove', ('delete', cart), ('post', cart), None),
+        ('favorite bulk add', ('post', favorite_bulk, bulk), None,
+         ('delete', favorite_bulk, bulk)),
+        ('cart bulk add', ('post', cart_bulk, bulk), None,
+         ('delete', cart_bulk, bulk)),
+        ('subscribe', ('post', subscribe), None, ('delete', subscribe)),
+        ('unsubscribe', ('delete', subscribe), ('post', subscribe), None),
+    ]
+    if own_recipe is not None:
+        endpoints.append(('recipe update', (
+            'patch', f'/api/recipes/{own_recipe.id}/',
+            recipe_payload(own_recipe),
+        )))
+    return endpoints
+
+
+def recipe_payload(recipe):
+    return {
+        'name': recipe.name,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+        'tags': list(recipe.tags.values_list('id', flat=True)),
+        'ingredients': [
+            {'id': row.ingredient_id, 'amount': row.amount}
+            for row in recipe.ingredient_list.all()
+        ],
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер числа SQL-запросов, задержек и памяти для всех эндпоинтов '
+        'API на синтетических данных разного объёма. Данные создаются в '
+        'отдельной тестовой базе, результат выводится в JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='100,1000',
+            help='Количество рецептов в наборах данных через запятую')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--output', help='Файл для результата')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        old_name = connection.settings_dict['NAME']
+        setup_test_environment(debug=False)
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = [
+                self.run_size(size, options['repeat']) for size in sizes
+            ]
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        report = json.dumps({
+            'database': connection.vendor,
+            'repeat': options['repeat'],
+            'results': results,
+        }, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(report)
+        else:
+            self.stdout.write(report)
+
+    def run_size(self, size, repeat):
+        call_command('flush', interactive=False, verbosity=0)
+        cache.clear()
+        call_command(
+            'generate_data',
+            recipes=size,
+            users=max(size // 10, 10),
+            stdout=self.stderr,
+        )
+        user = Subscriber.objects.values_list('user', flat=True).first()
+        user = User.objects.get(pk=user)
+        token, _ = Token.objects.get_or_create(user=user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        endpoints = []
+        for name, request, *steps in get_endpoints(user):
+            before, after = steps or (None, None)
+            endpoints.append(self.measure(
+                client, name, request, before, after, repeat))
+        return {
+            'recipes': size,
+            'users': User.objects.count(),
+            'endpoints': endpoints,
+        }
+
+    def request(self, client, method, url, data=None):
+        response = getattr(client, method)(url, data, format='json')
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    def measure(self, client, name, request, before, after, repeat):
+        method, url = request[:2]
+        latencies = []
+        for _ in range(repeat):
+            if before:
+                self.request(client, *before)
+            started = time.perf_counter()
+            response = self.request(client, *request)
+            latencies.append(time.perf_counter() - started)
+            if after:
+                self.request(client, *after)
+        if before:
+            self.request(client, *before)
+        with CaptureQueriesContext(connection) as queries:
+            self.request(client, *request)
+        query_count = len(queries)
+        if after:
+            self.request(client, *after)
+        if before:
+            self.request(client, *before)
+        tracemalloc.start()
+        self.request(client, *request)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        if after:
+            self.request(client, *after)
+        return {
+            'name': name,
+            'method': method.upper(),
+            'url': url,
+            'status': response.status_code,
+            'queries': query_count,
+            'p50_ms': round(statistics.median(latencies) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
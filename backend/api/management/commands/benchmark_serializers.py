@@ -0,0 +1,77 @@
+import json
+import statistics
+import time
+
+from api.renderers import ORJSONRenderer
+from api.serializers import RecipeReadSerializer
+from api.views import RecipeViewSet
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.serializers import ListSerializer
+from rest_framework.test import APIRequestFactory
+from users.models import Subscriber, User
+
+
+def measure(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started)
+    return result, round(statistics.median(timings) * 1000, 3)
+
+
+class Command(BaseCommand):
+    help = ('Сравнение сериализации списка рецептов: ModelSerializer и '
+            'JSONRenderer против быстрого пути и ORJSONRenderer')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        user_id = Subscriber.objects.values_list('user', flat=True).first()
+        if user_id is None:
+            raise CommandError(
+                'Нет данных: сначала выполните generate_data')
+        request = Request(APIRequestFactory().get(
+            '/api/recipes/', HTTP_HOST=settings.ALLOWED_HOSTS[0]))
+        request.user = User.objects.get(pk=user_id)
+        view = RecipeViewSet(
+            request=request, action='list', format_kwarg=None, kwargs={})
+        recipes = list(view.get_queryset()[:options['limit']])
+        context = view.get_serializer_context()
+        repeat = options['repeat']
+
+        drf_data, drf_serialize = measure(lambda: ListSerializer(
+            recipes, child=RecipeReadSerializer(), context=context
+        ).data, repeat)
+        drf_content, drf_render = measure(
+            lambda: JSONRenderer().render(drf_data), repeat)
+        fast_data, fast_serialize = measure(lambda: RecipeReadSerializer(
+            recipes, many=True, context=context
+        ).data, repeat)
+        fast_content, fast_render = measure(
+            lambda: ORJSONRenderer().render(fast_data), repeat)
+        if fast_content != drf_content:
+            raise CommandError('Результаты сериализации различаются')
+        drf_total = drf_serialize + drf_render
+        fast_total = fast_serialize + fast_render
+        self.stdout.write(json.dumps({
+            'recipes': len(recipes),
+            'bytes': len(fast_content),
+            'identical': True,
+            'drf_ms': {
+                'serialize': drf_serialize,
+                'render': drf_render,
+                'total': round(drf_total, 3),
+            },
+            'fast_ms': {
+                'serialize': fast_serialize,
+                'render': fast_render,
+                'total': round(fast_total, 3),
+            },
+            'speedup': round(drf_total / fast_total, 2),
+        }, indent=2))
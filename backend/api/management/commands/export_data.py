@@ -0,0 +1,46 @@
+import sys
+
+from api.export import DATASETS, EXPORTERS, export_rows
+from api.serializers import ExportSerializer
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = ('Потоковая выгрузка набора данных в JSON Lines или CSV, '
+            'полная или после отметки since/after-id')
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=DATASETS)
+        parser.add_argument(
+            '--format', choices=EXPORTERS, default='jsonl')
+        parser.add_argument(
+            '--since', help='Дата последней выгруженной строки (рецепты)')
+        parser.add_argument(
+            '--after-id', type=int, help='id последней выгруженной строки')
+        parser.add_argument('--output', help='Файл; по умолчанию stdout')
+
+    def handle(self, *args, **options):
+        serializer = ExportSerializer(data={
+            key: options[key] for key in ('since', 'after_id')
+            if options[key] is not None
+        }, context={'dataset': options['dataset']})
+        if not serializer.is_valid():
+            raise CommandError(serializer.errors)
+        chunks = EXPORTERS[options['format']](
+            options['dataset'],
+            export_rows(options['dataset'], **serializer.validated_data),
+        )
+        output = (
+            open(options['output'], 'wb') if options['output']
+            else sys.stdout.buffer
+        )
+        rows = 0
+        try:
+            for rows, chunk in enumerate(chunks, 1):
+                output.write(chunk)
+        finally:
+            if options['output']:
+                output.close()
+        if options['format'] == 'csv':
+            rows = max(rows - 1, 0)
+        self.stderr.write(f'Выгружено строк: {rows}')
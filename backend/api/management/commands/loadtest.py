@@ -0,0 +1,76 @@
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import URLError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand
+
+DEFAULT_PATHS = (
+    '/api/recipes/',
+    '/api/ingredients/',
+    '/api/tags/',
+    '/api/users/1/',
+)
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def fetch(request):
+    started = time.perf_counter()
+    try:
+        with urlopen(request) as response:
+            response.read()
+            ok = response.status == 200
+    except (URLError, OSError):
+        ok = False
+    return time.perf_counter() - started, ok
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест запущенных серверов: запросы в секунду и '
+        'задержки для каждого адреса, например WSGI и ASGI развёртываний'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('base_url', nargs='+', type=str)
+        parser.add_argument('--path', action='append', dest='paths')
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument(
+            '--token', help='Токен пользователя для заголовка Authorization')
+
+    def handle(self, *args, **options):
+        results = []
+        for base_url in options['base_url']:
+            for path in options['paths'] or DEFAULT_PATHS:
+                results.append(self.run(
+                    base_url.rstrip('/') + path,
+                    options['token'],
+                    options['concurrency'],
+                    options['requests'],
+                ))
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def run(self, url, token, concurrency, requests):
+        headers = {'Authorization': f'Token {token}'} if token else {}
+        request = Request(url, headers=headers)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            samples = list(executor.map(fetch, [request] * requests))
+        elapsed = time.perf_counter() - started
+        latencies = [latency for latency, _ in samples]
+        return {
+            'url': url,
+            'concurrency': concurrency,
+            'requests': requests,
+            'errors': sum(not ok for _, ok in samples),
+            'rps': round(requests / elapsed, 1),
+            'p50_ms': round(statistics.median(latencies) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        }
@@ -0,0 +1,171 @@
+import hashlib
+import time
+
+from api.db import (pin_to_primary, read_from_primary, read_from_replicas,
+                    stop_reading_from_replicas)
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
+from django.http import Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from foodgram.metrics import record_cache
+from foodgram.middleware import add_serialization, serialization_mark
+from recipes.cache import (add_version, get_version, peek_version,
+                           recipe_version_name)
+from recipes.models import Favorite, Recipes, ShopCart
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from users.models import Subscriber
+
+
+class MetricsMixin:
+    """Учитывает в метриках запроса время сериализации.
+
+    Это время обработчика представления (после аутентификации и
+    проверки прав) без ожидания SQL-запросов.
+    """
+    serialization_started = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.serialization_started = serialization_mark()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        add_serialization(self.serialization_started)
+        self.serialization_started = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class ReplicaReadMixin:
+    """Чтение безопасных запросов с реплик БД из DATABASE_REPLICAS.
+
+    Реплики включаются после аутентификации, поэтому токен проверяется по
+    основной БД. Изменяющие запросы закрепляют пользователя за основной
+    БД на DB_REPLICA_PIN_SECONDS, а кэши заполняются с основной БД.
+    """
+    replica_token = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS:
+            self.replica_token = read_from_replicas(request.user)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        written = False
+        if self.replica_token is not None:
+            written = stop_reading_from_replicas(self.replica_token)
+            self.replica_token = None
+        if written or request.method not in SAFE_METHODS:
+            pin_to_primary(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class CachedListMixin:
+    """Отдаёт список справочника из кэша в виде готового JSON.
+
+    Ключ кэша содержит версию набора данных, которую сигналы меняют при
+    каждом изменении модели. Ответ снабжается заголовками ETag и
+    Last-Modified, на условные запросы возвращается 304.
+    """
+    cache_name = None
+
+    def get_cached_list(self, version):
+        key = f'{self.cache_name}:list:{version}'
+        cached = cache.get(key)
+        record_cache(self.cache_name, cached is not None)
+        if cached is None:
+            with read_from_primary():
+                queryset = self.filter_queryset(self.get_queryset())
+                content = JSONRenderer().render(
+                    self.get_serializer(queryset, many=True).data)
+            cached = content, f'"{hashlib.md5(content).hexdigest()}"'
+            cache.set(key, cached, settings.REFERENCE_CACHE_TIMEOUT)
+        return cached
+
+    def list(self, request, *args, **kwargs):
+        version = get_version(self.cache_name)
+        content, etag = self.get_cached_list(version)
+        last_modified = int(version)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = HttpResponse(
+                content, content_type=JSONRenderer.media_type)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
+
+
+class CachedRecipeMixin:
+    """Отдаёт рецепт из кэша, подставляя флаги текущего пользователя.
+
+    В кэше хранится часть ответа, не зависящая от пользователя, а ключ
+    содержит версию рецепта, которую сигналы меняют при изменении
+    рецепта, его ингредиентов, тегов и автора. Флаги is_favorited,
+    is_in_shopping_cart и is_subscribed автора считаются одним запросом.
+    """
+
+    def get_cached_recipe(self, pk):
+        """Часть ответа, не зависящая от пользователя.
+
+        Если версии рецепта нет в кэше, новая версия записывается только
+        после чтения рецепта: для несуществующих рецептов ключей не
+        остаётся. Если за время чтения рецепт изменили и версия уже
+        записана, ответ не кэшируется.
+        """
+        name = recipe_version_name(pk)
+        version = peek_version(name)
+        key = f'recipe:detail:{self.request.get_host()}:{pk}:{{}}'
+        data = None if version is None else cache.get(key.format(version))
+        record_cache('recipe_detail', data is not None)
+        if data is not None:
+            return data
+        new_version = time.time() if version is None else None
+        with read_from_primary():
+            data = self.get_serializer(self.get_object()).data
+        data['author']['is_subscribed'] = False
+        data['is_favorited'] = data['is_in_shopping_cart'] = False
+        if new_version is not None:
+            if not add_version(name, new_version):
+                return data
+            version = new_version
+        cache.set(key.format(version), data, settings.RECIPE_CACHE_TIMEOUT)
+        return data
+
+    def get_user_flags(self, pk):
+        user = self.request.user
+        if user.is_anonymous:
+            return False, False, False
+        flags = Recipes.objects.filter(pk=pk).values_list(
+            Exists(Favorite.objects.filter(
+                author=user, recipe=OuterRef('pk'))),
+            Exists(ShopCart.objects.filter(
+                author=user, recipe=OuterRef('pk'))),
+            Exists(Subscriber.objects.filter(
+                user=user, author=OuterRef('author'))),
+        )
+        result = flags.first()
+        if result is None:
+            # рецепта может ещё не быть на отстающей реплике
+            with read_from_primary():
+                result = flags.first()
+        if result is None:
+            raise Http404
+        return result
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            pk = int(kwargs[self.lookup_url_kwarg or self.lookup_field])
+        except ValueError:
+            raise Http404
+        data = self.get_cached_recipe(pk)
+        is_favorited, is_in_shopping_cart, is_subscribed = (
+            self.get_user_flags(pk))
+        return Response({
+            **data,
+            'author': {**data['author'], 'is_subscribed': is_subscribed},
+            'is_favorited': is_favorited,
+            'is_in_shopping_cart': is_in_shopping_cart,
+        })
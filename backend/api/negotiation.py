@@ -0,0 +1,17 @@
+from rest_framework.negotiation import DefaultContentNegotiation
+
+
+class FormatParamNegotiation(DefaultContentNegotiation):
+    """Выбор рендерера только по параметру format, без заголовка Accept.
+
+    Для файлов, формат которых задаёт параметр: клиенты, по умолчанию
+    присылающие Accept: application/json, получают файл, а не ошибку
+    406. Без format выбирается первый из рендереров представления.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        format = format_suffix or request.query_params.get(
+            self.settings.URL_FORMAT_OVERRIDE)
+        if format:
+            renderers = self.filter_renderers(renderers, format)
+        return renderers[0], renderers[0].media_type
@@ -1,6 +1,53 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (Cursor, CursorPagination,
+                                       PageNumberPagination)
 
 
 class CustomPagination(PageNumberPagination):
     page_size = 6
     page_size_query_param = "limit"
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Постраничный вывод по курсору, без OFFSET и подсчёта COUNT(*).
+
+    Включается параметром pagination=cursor, ответ содержит только
+    ссылки next/previous и results.
+    """
+    page_size = 6
+    page_size_query_param = "limit"
+    ordering = ('-pub_date', '-id')
+
+
+class FeedCursorPagination(RecipeCursorPagination):
+    """Постраничный вывод ленты по курсору, только вперёд.
+
+    Страница строится не из queryset, а из позиций ленты
+    (время публикации, id), курсор хранит позицию последнего рецепта.
+    """
+
+    def paginate_positions(self, load_positions, request):
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        before = None
+        if cursor is not None:
+            try:
+                before = tuple(map(int, cursor.position.split('_')))
+            except (AttributeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+        positions = load_positions(before, self.page_size + 1)
+        self.has_next = len(positions) > self.page_size
+        positions = positions[:self.page_size]
+        self.last_position = positions[-1] if positions else None
+        return positions
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(Cursor(
+            offset=0, reverse=False,
+            position='_'.join(map(str, self.last_position))))
+
+    def get_previous_link(self):
+        return None
@@ -0,0 +1,74 @@
+import time
+
+import orjson
+from foodgram.middleware import add_rendering
+from rest_framework.renderers import JSONRenderer
+
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer на orjson с тем же результатом побайтно.
+
+    Даты и прочие типы, которые orjson не поддерживает или выводит
+    иначе, сериализуются кодировщиком DRF. Запросы с indent и данные,
+    с которыми orjson не справляется, отдаются обычному JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        started = time.perf_counter()
+        try:
+            return self.render_json(
+                data, accepted_media_type, renderer_context)
+        finally:
+            add_rendering(started)
+
+    def render_json(self, data, accepted_media_type, renderer_context):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            return super().render(
+                data, accepted_media_type, renderer_context)
+        try:
+            content = orjson.dumps(
+                data, default=self.encoder_class().default,
+                option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(
+                data, accepted_media_type, renderer_context)
+        # как и JSONRenderer, экранирует разделители строк для JavaScript
+        return content.replace(
+            '\u2028'.encode(), b'\\u2028'
+        ).replace('\u2029'.encode(), b'\\u2029')
+
+
+class ShoppingListTextRenderer(JSONRenderer):
+    """Список покупок в формате txt.
+
+    Сам файл формирует представление, а рендереры нужны для выбора
+    формата по параметру format; ошибки отдаются в виде JSON.
+    """
+    media_type = 'text/plain'
+    format = 'txt'
+
+
+class ShoppingListCSVRenderer(ShoppingListTextRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class ShoppingListPDFRenderer(ShoppingListTextRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+
+
+class ExportJSONLRenderer(JSONRenderer):
+    """Выгрузка в формате JSON Lines; см. ShoppingListTextRenderer."""
+    media_type = 'application/x-ndjson'
+    format = 'jsonl'
+
+
+class ExportCSVRenderer(ExportJSONLRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
@@ -1,11 +1,83 @@
+import binascii
+import io
+from operator import attrgetter
+
+from api.export import DATASETS
+from api.utils import decode_base64
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.db import transaction
-from drf_extra_fields.fields import Base64ImageField
+from django.db.models import Manager, Prefetch, prefetch_related_objects
+from drf_extra_fields.fields import Base64FieldMixin, Base64ImageField
+from PIL import Image
+from recipes import shopping_list
+from recipes.images import get_variant_name, save_recipe_image
 from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipes,
-                            ShopCart, Tags)
+                            ShopCart, ShopCartIngredient, Tags)
 from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
 from rest_framework.fields import IntegerField, SerializerMethodField
 from rest_framework.relations import PrimaryKeyRelatedField
-from users.serializers import CustomUserSerializer
+from users.serializers import CustomUserSerializer, get_subscribed_ids
+
+
+class RecipeImageField(Base64ImageField):
+    """Изображение рецепта, отдаваемое уменьшенной копией, если она есть.
+
+    Размер копии задаётся параметром variant или ключом image_variant
+    контекста; без них возвращается исходное изображение. При загрузке
+    размер файла и число пикселей ограничены IMAGE_MAX_BYTES и
+    IMAGE_MAX_PIXELS и проверяются до полного разбора изображения.
+    """
+
+    def __init__(self, *args, variant=None, **kwargs):
+        self.variant = variant
+        super().__init__(*args, **kwargs)
+
+    def to_internal_value(self, base64_data):
+        if base64_data in self.EMPTY_VALUES or not isinstance(
+                base64_data, str):
+            return super().to_internal_value(base64_data)
+        base64_data = base64_data.split(';base64,')[-1]
+        try:
+            decoded_file = decode_base64(
+                base64_data, settings.IMAGE_MAX_BYTES)
+        except (binascii.Error, ValueError):
+            raise ValidationError(self.INVALID_FILE_MESSAGE)
+        if decoded_file is None:
+            raise ValidationError(
+                'Размер изображения не должен превышать '
+                f'{settings.IMAGE_MAX_BYTES} байт'
+            )
+        try:
+            with Image.open(io.BytesIO(decoded_file)) as image:
+                width, height = image.size
+        except (OSError, Image.DecompressionBombError):
+            raise ValidationError(self.INVALID_FILE_MESSAGE)
+        if width * height > settings.IMAGE_MAX_PIXELS:
+            raise ValidationError(
+                'Изображение не должно содержать больше '
+                f'{settings.IMAGE_MAX_PIXELS} пикселей'
+            )
+        file_name = self.get_file_name(decoded_file)
+        file_extension = self.get_file_extension(file_name, decoded_file)
+        if file_extension not in self.ALLOWED_TYPES:
+            raise ValidationError(self.INVALID_TYPE_MESSAGE)
+        return super(Base64FieldMixin, self).to_internal_value(
+            SimpleUploadedFile(
+                name=f'{file_name}.{file_extension}', content=decoded_file)
+        )
+
+    def to_representation(self, file):
+        variant = self.variant or self.context.get('image_variant')
+        name = variant and file and get_variant_name(file.instance, variant)
+        if not name:
+            return super().to_representation(file)
+        url = default_storage.url(name)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
 
 
 class IngredientSerializer(serializers.ModelSerializer):
@@ -33,12 +105,81 @@ class IngredientRecipeReadSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount',)
 
 
+class ShopCartIngredientSerializer(IngredientRecipeReadSerializer):
+
+    class Meta(IngredientRecipeReadSerializer.Meta):
+        model = ShopCartIngredient
+
+
+PLAIN_FIELDS = (
+    serializers.BooleanField, serializers.CharField,
+    serializers.ChoiceField, serializers.IntegerField,
+)
+
+
+def compile_representation(serializer, **special):
+    """Функция, строящая словарь с полями сериализатора в том же порядке.
+
+    Простые поля читаются одним attrgetter по source без вызова
+    to_representation полей DRF, для остальных полей функции передаются
+    в special.
+    """
+    accessors = []
+    for name, field in serializer.fields.items():
+        if name in special:
+            accessors.append((name, special[name]))
+        elif isinstance(field, PLAIN_FIELDS):
+            accessors.append((name, attrgetter(field.source)))
+        else:
+            raise ImproperlyConfigured(
+                f'Поле {name} сериализатора {type(serializer).__name__} '
+                'требует функцию в special'
+            )
+    return lambda obj: {name: get(obj) for name, get in accessors}
+
+
+class RecipeReadListSerializer(serializers.ListSerializer):
+    """Быстрое представление списка рецептов.
+
+    Даёт тот же результат, что RecipeReadSerializer для каждого рецепта,
+    но собирает словари напрямую из объектов с предзагруженными связями.
+    """
+
+    def get_representation(self):
+        child = self.child
+        fields = child.fields
+        subscribed_ids = get_subscribed_ids(self.context.get('request'))
+        author = compile_representation(
+            fields['author'],
+            is_subscribed=lambda user: user.id in subscribed_ids,
+        )
+        tag = compile_representation(fields['tags'].child)
+        ingredient = compile_representation(fields['ingredients'].child)
+        image = fields['image']
+        return compile_representation(
+            child,
+            author=lambda recipe: author(recipe.author),
+            tags=lambda recipe: [tag(item) for item in recipe.tags.all()],
+            ingredients=lambda recipe: [
+                ingredient(item) for item in recipe.ingredient_list.all()
+            ],
+            image=lambda recipe: image.to_representation(recipe.image),
+            is_favorited=child.get_is_favorited,
+            is_in_shopping_cart=child.get_is_in_shopping_cart,
+        )
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, Manager) else data
+        represent = self.get_representation()
+        return [represent(recipe) for recipe in iterable]
+
+
 class RecipeReadSerializer(serializers.ModelSerializer):
     tags = TagSerializer(many=True)
     ingredients = IngredientRecipeReadSerializer(
         many=True, source='ingredient_list')
     author = CustomUserSerializer()
-    image = Base64ImageField()
+    image = RecipeImageField()
     is_favorited = SerializerMethodField(read_only=True)
     is_in_shopping_cart = SerializerMethodField(read_only=True)
 
@@ -47,8 +188,11 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         fields = ('id', 'author', 'tags', 'image',
                   'ingredients', 'name', 'text',
                   'cooking_time', 'is_favorited', 'is_in_shopping_cart')
+        list_serializer_class = RecipeReadListSerializer
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         return (request and request.user.is_authenticated
                 and Favorite.objects.filter(
@@ -56,6 +200,8 @@ class RecipeReadSerializer(serializers.ModelSerializer):
                 ).exists())
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         return (request and request.user.is_authenticated
                 and ShopCart.objects.filter(
@@ -73,11 +219,10 @@ class IngredientRecipeCreateSerializer(serializers.ModelSerializer):
 
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
-    image = Base64ImageField()
     author = CustomUserSerializer(read_only=True)
     ingredients = IngredientRecipeCreateSerializer(many=True)
     tags = PrimaryKeyRelatedField(queryset=Tags.objects.all(), many=True)
-    image = Base64ImageField()
+    image = RecipeImageField()
 
     class Meta:
         model = Recipes
@@ -108,23 +253,78 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
                 )
             else:
                 ingredients_set.append(ingredient['id'])
+        ingredient_ids = {
+            ingredient['id'] for ingredient in data['ingredients']
+        }
+        missing_ids = ingredient_ids - set(Ingredient.objects.filter(
+            id__in=ingredient_ids).values_list('id', flat=True))
+        if missing_ids:
+            raise serializers.ValidationError({
+                'ingredients': 'Ингредиенты не найдены: {}'.format(
+                    ', '.join(str(id) for id in sorted(missing_ids)))
+            })
         return data
 
     def create_ingredients(self, ingredients, recipe):
-        for ingredient in ingredients:
-            ingredienst = Ingredient.objects.get(id=ingredient['id'])
-            IngredientRecipe.objects.bulk_create(
-                [IngredientRecipe(
-                    ingredient=ingredienst, recipe=recipe,
-                    amount=ingredient['amount']
-                )
-                ]
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(
+                ingredient_id=ingredient['id'], recipe=recipe,
+                amount=ingredient['amount']
             )
+            for ingredient in ingredients
+        )
+
+    def update_ingredients(self, ingredients, recipe):
+        """Изменяет только добавленные, удалённые и изменённые строки.
+
+        Разница количеств переносится в итоги списков покупок.
+        """
+        amounts = {
+            ingredient['id']: ingredient['amount']
+            for ingredient in ingredients
+        }
+        removed, changed, deltas = [], [], {}
+        for row in recipe.ingredient_list.all():
+            amount = amounts.pop(row.ingredient_id, None)
+            if amount is None:
+                removed.append(row.id)
+                deltas[row.ingredient_id] = -row.amount
+            elif amount != row.amount:
+                deltas[row.ingredient_id] = amount - row.amount
+                row.amount = amount
+                changed.append(row)
+        if removed:
+            IngredientRecipe.objects.filter(id__in=removed).delete()
+        if changed:
+            IngredientRecipe.objects.bulk_update(changed, ('amount',))
+        self.create_ingredients(
+            [{'id': id, 'amount': amount} for id, amount in amounts.items()],
+            recipe
+        )
+        deltas.update(amounts)
+        shopping_list.recipe_ingredients_changed(recipe.id, deltas)
+
+    def save_image_on_commit(self, validated_data):
+        """Записывает файл изображения только после фиксации транзакции.
+
+        В рецепт сразу попадает имя будущего файла, поэтому при откате
+        транзакции на диске не остаётся лишних файлов.
+        """
+        image = validated_data.get('image')
+        if image is None:
+            return
+        name = default_storage.get_available_name(
+            Recipes._meta.get_field('image').generate_filename(
+                None, image.name)
+        )
+        transaction.on_commit(lambda: save_recipe_image(name, image))
+        validated_data['image'] = name
 
     @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
+        self.save_image_on_commit(validated_data)
         recipe = Recipes.objects.create(**validated_data)
         recipe.tags.set(tags)
         self.create_ingredients(ingredients, recipe)
@@ -134,28 +334,105 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
+        self.save_image_on_commit(validated_data)
         instance = super().update(instance, validated_data)
-        instance.tags.clear()
         instance.tags.set(tags)
-        instance.ingredients.clear()
-        self.create_ingredients(ingredients=ingredients, recipe=instance)
-        instance.save()
+        self.update_ingredients(ingredients=ingredients, recipe=instance)
         return instance
 
     def to_representation(self, instance):
+        prefetch_related_objects([instance], 'tags', Prefetch(
+            'ingredient_list',
+            queryset=IngredientRecipe.objects.select_related('ingredient')
+        ))
         return RecipeReadSerializer(instance, context={
             'request': self.context.get('request')
         }).data
 
 
 class RecipeShortSerializer(serializers.ModelSerializer):
-    image = Base64ImageField()
+    image = RecipeImageField(variant='small')
 
     class Meta:
         model = Recipes
         fields = ('id', 'name', 'image', 'cooking_time',)
 
 
+class RecipeMatchSerializer(RecipeShortSerializer):
+    coverage = serializers.FloatField(read_only=True)
+    missing = serializers.IntegerField(read_only=True)
+
+    class Meta(RecipeShortSerializer.Meta):
+        fields = RecipeShortSerializer.Meta.fields + ('coverage', 'missing')
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_MAX_RECIPES,
+    )
+
+
+class ExportSerializer(serializers.Serializer):
+    """Отметка последней выгруженной строки для инкрементной выгрузки.
+
+    Набор данных передаётся в context['dataset']: дата (since) есть
+    только у наборов с полем даты, и для них id без даты не задаёт
+    позицию в выгрузке.
+    """
+    since = serializers.DateTimeField(required=False)
+    after_id = serializers.IntegerField(min_value=0, required=False)
+
+    def validate(self, data):
+        dataset = self.context['dataset']
+        if DATASETS[dataset][2] is None:
+            if 'since' in data:
+                raise serializers.ValidationError({
+                    'since': f'Набор {dataset} выгружается только после '
+                             f'отметки after_id'
+                })
+        elif 'after_id' in data and 'since' not in data:
+            raise serializers.ValidationError({
+                'since': f'Для набора {dataset} after_id передаётся '
+                         f'вместе с since'
+            })
+        return data
+
+
+def get_ingredient_ids(request):
+    """Множество id из параметра ingredients: 1,2,3 или повторами."""
+    values = request.query_params.getlist('ingredients')
+    try:
+        ids = {
+            int(value) for item in values
+            for value in item.split(',') if value.strip()
+        }
+    except ValueError:
+        ids = set()
+    if not ids:
+        raise serializers.ValidationError({
+            'ingredients': 'Укажите id ингредиентов целыми числами'
+        })
+    return ids
+
+
+def get_recipes_limit(request):
+    """Значение параметра recipes_limit или None, если он не передан."""
+    limit = request.query_params.get('recipes_limit') if request else None
+    if limit is None:
+        return None
+    try:
+        limit = int(limit)
+    except ValueError:
+        limit = -1
+    if limit < 0:
+        raise serializers.ValidationError({
+            'recipes_limit': 'Должно быть целым неотрицательным числом'
+        })
+    return limit
+
+
 class SubscribeSerializer(CustomUserSerializer):
     recipes = serializers.SerializerMethodField()
     recipes_count = serializers.SerializerMethodField()
@@ -167,12 +444,15 @@ class SubscribeSerializer(CustomUserSerializer):
         read_only_fields = CustomUserSerializer.Meta.fields
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
-        queryset = obj.recipe.all()
-        if limit:
-            queryset = queryset[:int(limit)]
+        queryset = getattr(obj, 'limited_recipes', None)
+        if queryset is None:
+            queryset = obj.recipe.all()
+            limit = get_recipes_limit(self.context.get('request'))
+            if limit is not None:
+                queryset = queryset[:limit]
         return RecipeShortSerializer(queryset, many=True).data
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return obj.recipe.count()
@@ -0,0 +1,87 @@
+import json
+from datetime import timedelta
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.utils import timezone
+from recipes.models import Favorite, Recipes
+from rest_framework.test import APIClient
+from users.models import User
+
+
+@pytest.fixture
+def admin():
+    return User.objects.create(
+        username='admin', email='admin@example.org', is_staff=True)
+
+
+@pytest.fixture
+def recipes(admin):
+    """Рецепты, у части которых одинаковая дата публикации."""
+    recipes = [
+        Recipes.objects.create(
+            author=admin, name=f'Рецепт {num}', text='Описание',
+            cooking_time=1, image='recipes/image.png',
+        )
+        for num in range(7)
+    ]
+    now = timezone.now()
+    for num, recipe in enumerate(recipes):
+        Recipes.objects.filter(pk=recipe.pk).update(
+            pub_date=now + timedelta(minutes=num // 3))
+    for recipe in recipes:
+        Favorite.objects.create(author=admin, recipe=recipe)
+    return list(Recipes.objects.order_by('pub_date', 'id'))
+
+
+def export(client, dataset, **params):
+    response = client.get(f'/api/export/{dataset}/', {
+        'format': 'jsonl', **params})
+    assert response.status_code == 200, response.content
+    return [
+        json.loads(line)
+        for line in b''.join(response.streaming_content).splitlines()
+    ]
+
+
+@pytest.mark.django_db
+def test_export_permissions(admin):
+    client = APIClient()
+    assert client.get('/api/export/recipes/').status_code == 401
+    user = User.objects.create(username='user', email='user@example.org')
+    client.force_authenticate(user)
+    assert client.get('/api/export/recipes/').status_code == 403
+    client.force_authenticate(admin)
+    assert client.get('/api/export/recipes/').status_code == 200
+
+
+@pytest.mark.django_db
+def test_incremental_export_in_chunks(settings, admin, recipes):
+    settings.EXPORT_CHUNK_SIZE = 2
+    client = APIClient()
+    client.force_authenticate(admin)
+    rows = export(client, 'recipes')
+    assert [row['id'] for row in rows] == [recipe.id for recipe in recipes]
+    mark = recipes[3]
+    rows = export(
+        client, 'recipes',
+        since=mark.pub_date.isoformat(), after_id=mark.id)
+    assert [row['id'] for row in rows] == [
+        recipe.id for recipe in recipes[4:]]
+    favorites = Favorite.objects.order_by('id')
+    rows = export(client, 'favorites', after_id=favorites[2].id)
+    assert [row['id'] for row in rows] == [
+        favorite.id for favorite in favorites[3:]]
+
+
+@pytest.mark.django_db
+def test_export_rejects_unsupported_marks(admin, recipes):
+    client = APIClient()
+    client.force_authenticate(admin)
+    since = recipes[0].pub_date.isoformat()
+    response = client.get('/api/export/favorites/', {'since': since})
+    assert response.status_code == 400
+    response = client.get('/api/export/recipes/', {'after_id': 1})
+    assert response.status_code == 400
+    with pytest.raises(CommandError):
+        call_command('export_data', 'favorites', since=since)
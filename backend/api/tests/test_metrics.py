@@ -0,0 +1,21 @@
+import pytest
+from foodgram import metrics
+from rest_framework.test import APIClient
+
+LABELS = 'endpoint="RecipeViewSet.list",method="GET"'
+
+
+@pytest.mark.django_db
+def test_metrics_count_queries_and_time():
+    """Запросы к БД, сериализация и рендеринг учитываются по эндпоинту."""
+    queries = metrics.queries_total.values[LABELS]
+    _, serialization, count = metrics.serialization_duration.values[LABELS]
+    rendering = metrics.render_duration.values[LABELS][1]
+    response = APIClient().get('/api/recipes/')
+    assert response.status_code == 200
+    assert metrics.queries_total.values[LABELS] > queries
+    _, new_serialization, new_count = (
+        metrics.serialization_duration.values[LABELS])
+    assert new_count == count + 1
+    assert new_serialization > serialization
+    assert metrics.render_duration.values[LABELS][1] > rendering
@@ -0,0 +1,181 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from recipes.cache import VERSION_KEY, recipe_version_name
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipes,
+                            ShopCart, Tags)
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.models import Subscriber, User
+
+RECIPES_COUNT = 60
+
+
+@pytest.fixture
+def user():
+    return User.objects.create_user(
+        username='reader', email='reader@example.org', password='password')
+
+
+@pytest.fixture
+def recipes(user):
+    """Рецепты разных авторов с тегами и ингредиентами."""
+    authors = [
+        User.objects.create(
+            username=f'author{num}', email=f'author{num}@example.org')
+        for num in range(3)
+    ]
+    tags = [
+        Tags.objects.create(
+            name=f'Тег {num}', color=f'#00000{num}', slug=f'tag{num}')
+        for num in range(3)
+    ]
+    ingredients = [
+        Ingredient.objects.create(
+            name=f'Ингредиент {num}', measurement_unit='г')
+        for num in range(5)
+    ]
+    recipes = [
+        Recipes.objects.create(
+            author=authors[num % len(authors)],
+            name=f'Рецепт {num}',
+            text='Описание',
+            cooking_time=10,
+            image='recipes/image.png',
+        )
+        for num in range(RECIPES_COUNT)
+    ]
+    Recipes.tags.through.objects.bulk_create(
+        Recipes.tags.through(recipes_id=recipe.id, tags_id=tag.id)
+        for recipe in recipes for tag in tags[:2]
+    )
+    IngredientRecipe.objects.bulk_create(
+        IngredientRecipe(recipe=recipe, ingredient=ingredient, amount=5)
+        for recipe in recipes for ingredient in ingredients[:3]
+    )
+    Favorite.objects.create(author=user, recipe=recipes[0])
+    ShopCart.objects.create(author=user, recipe=recipes[1])
+    Subscriber.objects.create(user=user, author=authors[0])
+    return recipes
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('authenticated, queries', [(False, 4), (True, 6)])
+@pytest.mark.parametrize('limit', [6, 50])
+def test_recipe_list_query_count(
+    django_assert_num_queries, user, recipes, authenticated, queries, limit
+):
+    """Число запросов списка рецептов не зависит от размера страницы."""
+    client = APIClient()
+    if authenticated:
+        token = Token.objects.create(user=user)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    with django_assert_num_queries(queries):
+        response = client.get(f'/api/recipes/?limit={limit}')
+    assert response.status_code == 200
+    assert len(response.data['results']) == limit
+
+
+@pytest.mark.django_db
+def test_recipe_detail_does_not_create_versions():
+    """Запросы к несуществующим рецептам не оставляют ключей в кэше."""
+    response = APIClient().get('/api/recipes/999999/')
+    assert response.status_code == 404
+    assert cache.get(VERSION_KEY.format(recipe_version_name(999999))) is None
+
+
+@pytest.mark.django_db
+def test_recipe_detail_cache_follows_changes(
+    django_capture_on_commit_callbacks, recipes
+):
+    recipe = recipes[0]
+    client = APIClient()
+    assert client.get(f'/api/recipes/{recipe.id}/').data['name'] == (
+        recipe.name)
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe.name = 'Новое название'
+        recipe.save()
+    assert client.get(f'/api/recipes/{recipe.id}/').data['name'] == (
+        'Новое название')
+
+
+@pytest.mark.django_db
+def test_recipe_detail_cache_after_version_eviction(recipes):
+    """Ответ, закэшированный с вытесненной версией, не отдаётся снова."""
+    recipe = recipes[0]
+    key = VERSION_KEY.format(recipe_version_name(recipe.id))
+    client = APIClient()
+    client.get(f'/api/recipes/{recipe.id}/')
+    assert cache.get(key) is not None
+    cache.delete(key)
+    Recipes.objects.filter(pk=recipe.pk).update(name='Новое название')
+    assert client.get(f'/api/recipes/{recipe.id}/').data['name'] == (
+        'Новое название')
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url', ['favorite', 'shopping_cart'])
+def test_add_recipe_statuses(user, recipes, url):
+    client = APIClient()
+    client.force_authenticate(user)
+    recipe = recipes[-1]
+    response = client.post(f'/api/recipes/{recipe.id}/{url}/')
+    assert response.status_code == 201
+    assert response.data['name'] == recipe.name
+    assert client.post(f'/api/recipes/{recipe.id}/{url}/').status_code == 400
+    assert client.post(f'/api/recipes/999999/{url}/').status_code == 404
+
+
+@pytest.mark.django_db
+def test_add_favorite_query_count(user, recipes):
+    """INSERT, счётчик избранного и чтение рецепта для ответа.
+
+    SAVEPOINT появляется только внутри транзакции теста и не считается.
+    """
+    client = APIClient()
+    client.force_authenticate(user)
+    with CaptureQueriesContext(connection) as context:
+        response = client.post(f'/api/recipes/{recipes[-1].id}/favorite/')
+    queries = [
+        query['sql'] for query in context.captured_queries
+        if 'SAVEPOINT' not in query['sql']
+    ]
+    assert len(queries) == 3, queries
+    assert response.status_code == 201
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('params, status_code', [
+    ({}, 200),
+    ({'ordering': '-pub_date'}, 200),
+    ({'ordering': '-popular'}, 400),
+    ({'search': 'Рецепт'}, 400),
+])
+def test_cursor_pagination_ordering(recipes, params, status_code):
+    response = APIClient().get(
+        '/api/recipes/', {'pagination': 'cursor', **params})
+    assert response.status_code == status_code
+
+
+@pytest.mark.django_db
+def test_cursor_pagination_rejected_for_match(recipes):
+    ingredient = recipes[0].ingredients.first()
+    response = APIClient().get('/api/recipes/match/', {
+        'pagination': 'cursor', 'ingredients': ingredient.id})
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('accept, params, content_type', [
+    ('application/json', {}, 'text/plain'),
+    ('*/*', {}, 'text/plain'),
+    ('application/json', {'format': 'csv'}, 'text/csv'),
+])
+def test_download_shopping_cart_format(user, accept, params, content_type):
+    client = APIClient()
+    client.force_authenticate(user)
+    response = client.get(
+        '/api/recipes/download_shopping_cart/', params, HTTP_ACCEPT=accept)
+    assert response.status_code == 200
+    assert response['Content-Type'].startswith(content_type)
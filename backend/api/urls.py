@@ -1,4 +1,5 @@
-from api.views import IngredientViewSet, RecipeViewSet, TagViewSet
+from api.views import (ExportViewSet, IngredientViewSet, RecipeViewSet,
+                       TagViewSet)
 from django.urls import include, path
 from rest_framework import routers
 from users.views import CustomUserViewSet
@@ -10,6 +11,7 @@ router.register('ingredients', IngredientViewSet)
 router.register('tags', TagViewSet)
 router.register('recipes', RecipeViewSet)
 router.register('users', CustomUserViewSet)
+router.register('export', ExportViewSet, basename='export')
 
 
 urlpatterns = [
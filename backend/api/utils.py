@@ -0,0 +1,92 @@
+import binascii
+import csv
+import io
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+BASE64_CHUNK_SIZE = 64 * 1024
+PDF_FONT_NAME = 'ShoppingListFont'
+PDF_FONT_SIZE = 12
+PDF_MARGIN = 50
+PDF_LINE_HEIGHT = 18
+
+
+def decode_base64(data, max_size):
+    """Декодирует base64 по частям, не превышая max_size байт.
+
+    Возвращает None, если данные больше лимита: размер проверяется по
+    длине строки до декодирования и повторно по мере декодирования.
+    Некорректные данные приводят к binascii.Error.
+    """
+    data = ''.join(data.split())
+    if len(data) // 4 * 3 - data[-2:].count('=') > max_size:
+        return None
+    buffer = io.BytesIO()
+    for start in range(0, len(data), BASE64_CHUNK_SIZE):
+        chunk = data[start:start + BASE64_CHUNK_SIZE]
+        buffer.write(binascii.a2b_base64(chunk))
+        if buffer.tell() > max_size:
+            return None
+    return buffer.getvalue()
+
+
+def shopping_list_title(user):
+    return f'Список покупок для : {user.username}'
+
+
+def shopping_list_txt(user, ingredients):
+    """Построчно отдаёт список покупок в текстовом формате."""
+    yield f'{shopping_list_title(user)}\n'
+    for num, item in enumerate(ingredients):
+        yield (
+            f'{"; " if num else ""}'
+            f'\n* {item["ingredient__name"]} — {item["ingredient_amount"]} '
+            f'{item["ingredient__measurement_unit"]}'
+        )
+
+
+class Echo:
+    """Псевдобуфер для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def shopping_list_csv(user, ingredients):
+    """Построчно отдаёт список покупок в формате CSV."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(('Ингредиент', 'Количество', 'Единица измерения'))
+    for item in ingredients:
+        yield writer.writerow((
+            item['ingredient__name'],
+            item['ingredient_amount'],
+            item['ingredient__measurement_unit'],
+        ))
+
+
+def shopping_list_pdf(user, ingredients):
+    """Возвращает буфер с PDF-файлом списка покупок."""
+    if PDF_FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(
+            TTFont(PDF_FONT_NAME, settings.SHOPPING_LIST_FONT))
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    _, height = A4
+    y = height - PDF_MARGIN
+    for line in (shopping_list_title(user), *(
+        f'• {item["ingredient__name"]} — {item["ingredient_amount"]} '
+        f'{item["ingredient__measurement_unit"]}' for item in ingredients
+    )):
+        if y < PDF_MARGIN:
+            pdf.showPage()
+            y = height - PDF_MARGIN
+        pdf.setFont(PDF_FONT_NAME, PDF_FONT_SIZE)
+        pdf.drawString(PDF_MARGIN, y, line)
+        y -= PDF_LINE_HEIGHT
+    pdf.save()
+    buffer.seek(0)
+    return buffer
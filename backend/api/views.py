@@ -1,30 +1,53 @@
-from api.pagination import CustomPagination
+from api.export import DATASETS, EXPORTERS, export_queryset, export_rows
+from api.mixins import (CachedListMixin, CachedRecipeMixin, MetricsMixin,
+                        ReplicaReadMixin)
+from api.negotiation import FormatParamNegotiation
+from api.pagination import (CustomPagination, FeedCursorPagination,
+                            RecipeCursorPagination)
 from api.permissions import IsAdminOrReadOnly, IsOwnerOrReadOnly
-from api.serializers import (IngredientSerializer, RecipeCreateSerializer,
-                             RecipeReadSerializer, RecipeShortSerializer,
-                             TagSerializer)
-from django.db.models import Sum
-from django.http import HttpResponse
-from django.shortcuts import get_object_or_404
+from api.renderers import (ExportCSVRenderer, ExportJSONLRenderer,
+                           ShoppingListCSVRenderer, ShoppingListPDFRenderer,
+                           ShoppingListTextRenderer)
+from api.serializers import (ExportSerializer, IngredientSerializer,
+                             RecipeCreateSerializer, RecipeIdsSerializer,
+                             RecipeMatchSerializer, RecipeReadSerializer,
+                             RecipeShortSerializer,
+                             ShopCartIngredientSerializer, TagSerializer,
+                             get_ingredient_ids)
+from api.utils import (shopping_list_csv, shopping_list_pdf,
+                       shopping_list_txt)
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, OuterRef, Prefetch, Value
+from django.http import FileResponse, Http404, StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
+from recipes.autocomplete import ingredient_index
+from recipes.bulk import add_recipes, remove_recipes
+from recipes.feed import feed_positions
+from recipes.matching import match_recipes
 from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipes,
-                            ShopCart, Tags)
+                            ShopCart, ShopCartIngredient, Tags)
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import (SAFE_METHODS, IsAdminUser,
+                                        IsAuthenticated)
 from rest_framework.response import Response
 
 from .filters import IngredientFilter, RecipeFilter
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(MetricsMixin, ReplicaReadMixin, CachedListMixin,
+                 viewsets.ReadOnlyModelViewSet):
     """Изменение и создание тегов"""
     queryset = Tags.objects.all()
     serializer_class = TagSerializer
     permission_classes = (IsAdminOrReadOnly,)
+    cache_name = 'tags'
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(MetricsMixin, ReplicaReadMixin, CachedListMixin,
+                        viewsets.ReadOnlyModelViewSet):
     """Изменение и создание ингридиентов"""
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
@@ -32,9 +55,26 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = (DjangoFilterBackend, )
     filterset_class = IngredientFilter
     search_fields = ('^name', )
+    cache_name = 'ingredients'
 
+    def list(self, request, *args, **kwargs):
+        """Поиск по name ограничен INGREDIENT_SEARCH_LIMIT результатами.
 
-class RecipeViewSet(viewsets.ModelViewSet):
+        По умолчанию поиск идёт по индексу в памяти процесса, без
+        обращения к базе данных.
+        """
+        name = request.query_params.get('name')
+        if not name:
+            return super().list(request, *args, **kwargs)
+        limit = settings.INGREDIENT_SEARCH_LIMIT
+        if settings.INGREDIENT_AUTOCOMPLETE_CACHE:
+            return Response(ingredient_index.search(name, limit))
+        queryset = self.filter_queryset(self.get_queryset())[:limit]
+        return Response(self.get_serializer(queryset, many=True).data)
+
+
+class RecipeViewSet(MetricsMixin, ReplicaReadMixin, CachedRecipeMixin,
+                    viewsets.ModelViewSet):
     """Вывод,создание,изменение,удаление рецепта.
     Получение информации о рецептах.
     Добавление рецептов в избранное и список покупок.
@@ -47,6 +87,66 @@ class RecipeViewSet(viewsets.ModelViewSet):
     filterset_class = RecipeFilter
     pagination_class = CustomPagination
 
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if self.request.query_params.get('pagination') == 'cursor':
+                self.check_cursor_ordering()
+                self._paginator = RecipeCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def check_cursor_ordering(self):
+        """Курсор сортирует рецепты по дате публикации (-pub_date, -id).
+
+        Другая сортировка, ранжирование поиска и подбор по ингредиентам
+        с ним не сочетаются, такие запросы отклоняются.
+        """
+        params = self.request.query_params
+        if (self.action == 'match' or params.get('search')
+                or params.get('ordering', '-pub_date') != '-pub_date'):
+            raise ValidationError({'pagination': (
+                'Постраничный вывод по курсору возможен только с '
+                'сортировкой по дате публикации, без search и подбора '
+                'по ингредиентам'
+            )})
+
+    def get_queryset(self):
+        """Рецепты со всеми связями и флагами текущего пользователя.
+
+        Флаги is_favorited и is_in_shopping_cart считаются подзапросами
+        EXISTS, а теги и ингредиенты подгружаются заранее, поэтому
+        число запросов на страницу не зависит от её размера.
+        """
+        user = self.request.user
+        queryset = Recipes.objects.select_related('author').defer(
+            'search_vector'
+        ).prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredient_list',
+                queryset=IngredientRecipe.objects.select_related('ingredient')
+            ),
+        )
+        if user.is_anonymous:
+            return queryset.annotate(
+                is_favorited=Value(False),
+                is_in_shopping_cart=Value(False),
+            )
+        return queryset.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                author=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(ShopCart.objects.filter(
+                author=user, recipe=OuterRef('pk'))),
+        )
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action in ('list', 'feed'):
+            context['image_variant'] = 'medium'
+        return context
+
     def get_serializer_class(self):
         if self.request.method in SAFE_METHODS:
             return RecipeReadSerializer
@@ -56,26 +156,69 @@ class RecipeViewSet(viewsets.ModelViewSet):
         serializer.save(author=self.request.user)
 
     def add_obj(self, model, user, pk):
-        if model.objects.filter(author=user, recipe__id=pk).exists():
+        """Добавляет рецепт одним INSERT; рецепт читается только для ответа.
+
+        Если рецепта нет, вставка откатывается и возвращается 404.
+        Нарушение уникальности означает, что рецепт уже добавлен.
+        """
+        try:
+            with transaction.atomic():
+                model.objects.create(author=user, recipe_id=pk)
+                recipe = Recipes.objects.defer(
+                    'search_vector').filter(pk=pk).first()
+                if recipe is None:
+                    raise Http404
+        except IntegrityError:
             return Response(
                 {'errors': 'Рецепт уже добавлен!'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        recipe = get_object_or_404(Recipes, id=pk)
-        model.objects.create(author=user, recipe=recipe)
         serializer = RecipeShortSerializer(recipe)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @transaction.atomic
     def delete_obj(self, model, user, pk):
-        obj = model.objects.filter(author=user, recipe__pk=pk)
-        if obj.exists():
-            obj.delete()
+        deleted, _ = model.objects.filter(author=user, recipe__pk=pk).delete()
+        if deleted:
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(
             {'errors': 'Рецепт уже удален!'},
             status=status.HTTP_400_BAD_REQUEST
         )
 
+    def add_many(self, model, user, ids):
+        try:
+            added, existing, missing = add_recipes(model, user.id, ids)
+        except IntegrityError:
+            return Response(
+                {'errors': 'Рецепты уже добавляются другим запросом!'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return self.bulk_response(ids, {
+            **{id: 'not_found' for id in missing},
+            **{id: 'exists' for id in existing},
+            **{id: 'added' for id in added},
+        })
+
+    def delete_many(self, model, user, ids):
+        removed = remove_recipes(model, user.id, ids)
+        return self.bulk_response(ids, {
+            id: 'removed' if id in removed else 'not_found' for id in ids
+        })
+
+    def bulk_response(self, ids, outcomes):
+        return Response({'results': [
+            {'id': id, 'status': outcomes[id]} for id in dict.fromkeys(ids)
+        ]})
+
+    def bulk_action(self, model, request):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['recipes']
+        if request.method == 'POST':
+            return self.add_many(model, request.user, ids)
+        return self.delete_many(model, request.user, ids)
+
     @action(
         detail=True,
         methods=['post', 'delete'],
@@ -96,26 +239,145 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return self.add_obj(ShopCart, request.user, pk)
         return self.delete_obj(ShopCart, request.user, pk)
 
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        permission_classes=[IsAuthenticated],
+        url_path='favorite',
+        url_name='favorite-bulk',
+    )
+    def favorite_bulk(self, request):
+        """Добавление и удаление нескольких рецептов в избранном."""
+        return self.bulk_action(Favorite, request)
+
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        permission_classes=[IsAuthenticated],
+        url_path='shopping_cart',
+        url_name='shopping-cart-bulk',
+    )
+    def shopping_cart_bulk(self, request):
+        """Добавление и удаление нескольких рецептов в списке покупок."""
+        return self.bulk_action(ShopCart, request)
+
     @action(
         detail=False,
         methods=['get'],
-        permission_classes=[IsAuthenticated]
+        permission_classes=[IsAuthenticated],
+        renderer_classes=[
+            ShoppingListTextRenderer,
+            ShoppingListCSVRenderer,
+            ShoppingListPDFRenderer,
+        ],
+        content_negotiation_class=FormatParamNegotiation,
     )
     def download_shopping_cart(self, request):
-        shopping_list = f'Список покупок для : {request.user.username}\n'
-        ingredients = IngredientRecipe.objects.filter(
-            recipe__shop__author=request.user
-        ).values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(ingredient_amount=Sum('amount'))
-        for num, i in enumerate(ingredients):
-            shopping_list += (
-                f'\n* {i["ingredient__name"]} — {i["ingredient_amount"]} '
-                f'{i["ingredient__measurement_unit"]}'
+        """Список покупок в формате txt, csv или pdf (параметр format).
+
+        Итоги по ингредиентам читаются из ShopCartIngredient, а текстовые
+        форматы отдаются построчно, не собирая файл целиком в памяти.
+        """
+        user = request.user
+        file_format = request.accepted_renderer.format
+        ingredients = ShopCartIngredient.objects.filter(author=user).values(
+            'ingredient__name', 'ingredient__measurement_unit',
+            ingredient_amount=F('amount'),
+        ).order_by('ingredient__name')
+        filename = f'{user.username}_shopping_list.{file_format}'
+        if file_format == ShoppingListPDFRenderer.format:
+            return FileResponse(
+                shopping_list_pdf(user, ingredients),
+                as_attachment=True,
+                filename=filename,
+                content_type=ShoppingListPDFRenderer.media_type,
             )
-            if num < ingredients.count() - 1:
-                shopping_list += '; '
-        filename = f'{request.user.username}_shopping_list.txt'
-        response = HttpResponse(shopping_list, content_type='text/plain')
-        response['Content-Disposition'] = f'attachment; filename="{filename}'
+        if file_format == ShoppingListCSVRenderer.format:
+            content = shopping_list_csv(user, ingredients)
+        else:
+            content = shopping_list_txt(user, ingredients)
+        response = StreamingHttpResponse(
+            content,
+            content_type=f'{request.accepted_renderer.media_type}; '
+                         f'charset={settings.DEFAULT_CHARSET}',
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=[IsAuthenticated],
+    )
+    def shopping_cart_totals(self, request):
+        """Суммарное количество ингредиентов в списке покупок."""
+        ingredients = ShopCartIngredient.objects.filter(
+            author=request.user
+        ).select_related('ingredient').order_by('ingredient__name')
+        return Response(
+            ShopCartIngredientSerializer(ingredients, many=True).data)
+
+    @action(detail=False, methods=['get'])
+    def match(self, request):
+        """Рецепты из имеющихся ингредиентов (параметр ingredients).
+
+        Сортировка по доле имеющихся ингредиентов рецепта, затем по
+        числу недостающих.
+        """
+        queryset = match_recipes(get_ingredient_ids(request))
+        page = self.paginate_queryset(queryset)
+        serializer = RecipeMatchSerializer(
+            page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=[IsAuthenticated],
+    )
+    def feed(self, request):
+        """Новые рецепты авторов из подписок, по курсору.
+
+        Порядок рецептов страницы берётся из ленты пользователя в кэше,
+        сами рецепты читаются одним запросом.
+        """
+        paginator = FeedCursorPagination()
+        positions = paginator.paginate_positions(
+            lambda before, count: feed_positions(
+                request.user.id, before, count),
+            request,
+        )
+        ids = [recipe_id for _, recipe_id in positions]
+        recipes = self.get_queryset().in_bulk(ids)
+        serializer = self.get_serializer(
+            [recipes[id] for id in ids if id in recipes], many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+
+class ExportViewSet(MetricsMixin, ReplicaReadMixin, viewsets.ViewSet):
+    """Потоковая выгрузка набора данных для администраторов.
+
+    Формат задаётся параметром format (jsonl или csv), инкрементная
+    выгрузка — параметрами since и after_id.
+    """
+    permission_classes = (IsAdminUser,)
+    renderer_classes = (ExportJSONLRenderer, ExportCSVRenderer)
+    lookup_value_regex = '|'.join(DATASETS)
+
+    def retrieve(self, request, pk):
+        serializer = ExportSerializer(
+            data=request.query_params, context={'dataset': pk})
+        serializer.is_valid(raise_exception=True)
+        # строки читаются уже после обработки запроса, поэтому БД
+        # (реплика или основная) выбирается сейчас
+        rows = export_rows(
+            pk, using=export_queryset(pk).db, **serializer.validated_data)
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            EXPORTERS[renderer.format](pk, rows),
+            content_type=f'{renderer.media_type}; '
+                         f'charset={settings.DEFAULT_CHARSET}',
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{pk}.{renderer.format}"')
         return response
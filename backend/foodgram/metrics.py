@@ -0,0 +1,123 @@
+"""Метрики запросов к API в текстовом формате Prometheus.
+
+Значения хранятся в памяти процесса, поэтому каждый процесс gunicorn
+отдаёт собственные метрики.
+"""
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (
+    1_000, 10_000, 50_000, 100_000, 500_000, 1_000_000, 10_000_000)
+
+
+class Histogram:
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.values = defaultdict(lambda: [[0] * len(buckets), 0, 0])
+
+    def observe(self, labels, value):
+        counts, _, _ = data = self.values[labels]
+        position = bisect_left(self.buckets, value)
+        if position < len(counts):
+            counts[position] += 1
+        data[1] += value
+        data[2] += 1
+
+    def render(self):
+        yield f'# HELP {self.name} {self.help_text}'
+        yield f'# TYPE {self.name} histogram'
+        for labels, (counts, total, count) in self.values.items():
+            cumulative = 0
+            for bucket, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield (f'{self.name}_bucket{{{labels},le="{bucket}"}} '
+                       f'{cumulative}')
+            yield f'{self.name}_bucket{{{labels},le="+Inf"}} {count}'
+            yield f'{self.name}_sum{{{labels}}} {total}'
+            yield f'{self.name}_count{{{labels}}} {count}'
+
+
+class Counter:
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.values = defaultdict(int)
+
+    def inc(self, labels, value=1):
+        self.values[labels] += value
+
+    def render(self):
+        yield f'# HELP {self.name} {self.help_text}'
+        yield f'# TYPE {self.name} counter'
+        for labels, value in self.values.items():
+            yield f'{self.name}{{{labels}}} {value}'
+
+
+lock = threading.Lock()
+requests_total = Counter(
+    'foodgram_requests_total', 'Количество запросов')
+queries_total = Counter(
+    'foodgram_db_queries_total', 'Количество SQL-запросов')
+over_budget_total = Counter(
+    'foodgram_query_budget_exceeded_total',
+    'Запросы, превысившие бюджет SQL-запросов')
+duration = Histogram(
+    'foodgram_request_duration_seconds', 'Время обработки запроса',
+    DURATION_BUCKETS)
+db_duration = Histogram(
+    'foodgram_db_duration_seconds', 'Время выполнения SQL-запросов',
+    DURATION_BUCKETS)
+serialization_duration = Histogram(
+    'foodgram_serialization_duration_seconds',
+    'Время обработчика представления без ожидания БД: сериализация',
+    DURATION_BUCKETS)
+render_duration = Histogram(
+    'foodgram_render_duration_seconds', 'Время рендеринга ответа в JSON',
+    DURATION_BUCKETS)
+queries = Histogram(
+    'foodgram_db_queries', 'SQL-запросов на один запрос', QUERY_BUCKETS)
+cache_requests_total = Counter(
+    'foodgram_cache_requests_total', 'Обращения к кэшу ответов')
+response_size = Histogram(
+    'foodgram_response_size_bytes', 'Размер ответа', SIZE_BUCKETS)
+METRICS = (
+    requests_total, queries_total, over_budget_total, duration,
+    db_duration, serialization_duration, render_duration, queries,
+    response_size, cache_requests_total,
+)
+
+
+def record(endpoint, method, status, elapsed, stats, size, over_budget):
+    """Записывает метрики запроса; stats — его RequestStats."""
+    labels = f'endpoint="{endpoint}",method="{method}"'
+    with lock:
+        requests_total.inc(f'{labels},status="{status}"')
+        queries_total.inc(labels, stats.queries)
+        if over_budget:
+            over_budget_total.inc(labels)
+        duration.observe(labels, elapsed)
+        db_duration.observe(labels, stats.db_elapsed)
+        serialization_duration.observe(labels, stats.serialization)
+        render_duration.observe(labels, stats.rendering)
+        queries.observe(labels, stats.queries)
+        response_size.observe(labels, size)
+
+
+def record_cache(name, hit):
+    result = 'hit' if hit else 'miss'
+    with lock:
+        cache_requests_total.inc(f'cache="{name}",result="{result}"')
+
+
+def render():
+    with lock:
+        lines = [line for metric in METRICS for line in metric.render()]
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,164 @@
+import asyncio
+import logging
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Счётчики текущего запроса; None вне запроса.
+request_stats = ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    """SQL-запросы, их время и время сериализации и рендеринга запроса."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_elapsed = 0
+        self.serialization = 0
+        self.rendering = 0
+
+
+def count_queries(execute, sql, params, many, context):
+    """Обёртка выполнения SQL, считающая запросы в RequestStats запроса."""
+    stats = request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_elapsed += time.perf_counter() - started
+        stats.queries += 1
+
+
+def add_query_counter(connection):
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+@receiver(request_started)
+def install_query_counter(**kwargs):
+    """Подключает count_queries к соединениям с БД текущего потока.
+
+    Соединения у каждого потока свои, поэтому обёртка подключается в
+    потоке, где выполняется запрос, при request_started, а также к
+    каждому новому соединению. Вне запроса обёртка ничего не считает.
+    """
+    for connection in connections.all():
+        add_query_counter(connection)
+
+
+@receiver(connection_created)
+def connection_query_counter(connection, **kwargs):
+    add_query_counter(connection)
+
+
+def add_rendering(started):
+    """Добавляет ко времени рендеринга запроса время с момента started."""
+    stats = request_stats.get()
+    if stats is not None:
+        stats.rendering += time.perf_counter() - started
+
+
+def serialization_mark():
+    """Отметка начала обработчика представления для add_serialization()."""
+    stats = request_stats.get()
+    if stats is None:
+        return None
+    return time.perf_counter(), stats.db_elapsed
+
+
+def add_serialization(mark):
+    """Добавляет время обработчика с отметки mark без ожидания БД.
+
+    Обработчик представления читает данные и сериализует их; время SQL,
+    выполненного за это время, вычитается.
+    """
+    stats = request_stats.get()
+    if mark is None or stats is None:
+        return
+    started, db_elapsed = mark
+    stats.serialization += max(
+        time.perf_counter() - started - (stats.db_elapsed - db_elapsed), 0)
+
+
+def get_endpoint(request):
+    """Имя представления и действия, например RecipeViewSet.list."""
+    match = request.resolver_match
+    if match is None:
+        return 'unresolved'
+    view = match.func
+    view_class = getattr(view, 'cls', None)
+    if view_class is None:
+        return match.view_name
+    action = getattr(view, 'actions', {}).get(request.method.lower())
+    if action is None:
+        return view_class.__name__
+    return f'{view_class.__name__}.{action}'
+
+
+class MetricsMiddleware:
+    """Собирает по каждому эндпоинту число SQL-запросов, время и размер.
+
+    Работает и под WSGI, и под ASGI, не переводя асинхронные запросы в
+    один поток. Запросы, превысившие QUERY_BUDGET SQL-запросов,
+    записываются в журнал с предупреждением.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            request_stats.reset(token)
+        self.record(request, response, stats, started)
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            request_stats.reset(token)
+        self.record(request, response, stats, started)
+        return response
+
+    def record(self, request, response, stats, started):
+        elapsed = time.perf_counter() - started
+        endpoint = get_endpoint(request)
+        over_budget = stats.queries > settings.QUERY_BUDGET
+        if over_budget:
+            logger.warning(
+                '%s %s: %s SQL-запросов при бюджете %s',
+                endpoint, request.path, stats.queries, settings.QUERY_BUDGET)
+        metrics.record(
+            endpoint,
+            request.method,
+            response.status_code,
+            elapsed,
+            stats,
+            0 if response.streaming else len(response.content),
+            over_budget,
+        )
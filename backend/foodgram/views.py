@@ -0,0 +1,9 @@
+from django.http import HttpResponse
+
+from . import metrics
+
+
+def metrics_view(request):
+    """Метрики в формате Prometheus. Nginx не проксирует этот адрес."""
+    return HttpResponse(
+        metrics.render(), content_type='text/plain; version=0.0.4')
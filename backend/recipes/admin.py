@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from . import shopping_list
 from .models import (Favorite, Ingredient, IngredientRecipe, Recipes, ShopCart,
                      Tags)
 
@@ -26,10 +27,24 @@ class RecipeIngredientsInline(admin.TabularInline):
 class AdminRecipe(admin.ModelAdmin):
     list_display = ('pk', 'name', 'author', 'in_favorite')
     list_filter = ('name', 'author', 'tags', )
+    list_select_related = ('author',)
     inlines = (RecipeIngredientsInline,)
 
+    @admin.display(description='В избранном', ordering='favorites_count')
     def in_favorite(self, obj):
-        return obj.favorite.count()
+        return obj.favorites_count
+
+    def save_related(self, request, form, formsets, change):
+        """Переносит изменения ингредиентов в итоги списков покупок."""
+        if not change:
+            return super().save_related(request, form, formsets, change)
+        before = shopping_list.recipe_amounts(form.instance.pk)
+        super().save_related(request, form, formsets, change)
+        after = shopping_list.recipe_amounts(form.instance.pk)
+        shopping_list.recipe_ingredients_changed(form.instance.pk, {
+            id: after.get(id, 0) - before.get(id, 0)
+            for id in before.keys() | after.keys()
+        })
 
 
 @admin.register(Favorite)
@@ -0,0 +1,67 @@
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+from .cache import get_version
+from .models import Ingredient
+
+
+class IngredientIndex:
+    """Индекс каталога ингредиентов в памяти процесса для автодополнения.
+
+    Названия хранятся в отсортированном массиве: совпадения по началу
+    названия ищутся бинарным поиском, вхождения в середину — проходом по
+    массиву. Индекс строится при первом обращении и перестраивается при
+    смене версии ингредиентов в кэше или по истечении
+    INGREDIENT_AUTOCOMPLETE_TTL секунд.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = None
+        self._version = None
+        self._built_at = 0
+
+    def _load(self):
+        data = self._data
+        version = get_version('ingredients')
+        if data is not None and version == self._version and (
+            time.monotonic() - self._built_at
+            < settings.INGREDIENT_AUTOCOMPLETE_TTL
+        ):
+            return data
+        with self._lock:
+            if self._data is data:
+                items = [
+                    {'id': id, 'name': name, 'measurement_unit': unit}
+                    for id, name, unit in Ingredient.objects.values_list(
+                        'id', 'name', 'measurement_unit')
+                ]
+                items.sort(key=lambda item: item['name'].lower())
+                keys = [item['name'].lower() for item in items]
+                self._data = keys, items
+                self._version = version
+                self._built_at = time.monotonic()
+            return self._data
+
+    def search(self, query, limit):
+        """Сначала совпадения по началу названия, затем по вхождению."""
+        query = query.lower()
+        keys, items = self._load()
+        result = []
+        position = bisect_left(keys, query)
+        while (position < len(keys) and len(result) < limit
+               and keys[position].startswith(query)):
+            result.append(items[position])
+            position += 1
+        for key, item in zip(keys, items):
+            if len(result) >= limit:
+                break
+            if query in key and not key.startswith(query):
+                result.append(item)
+        return result
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,49 @@
+from django.db import transaction
+from django.db.models import F
+
+from . import shopping_list
+from .models import Favorite, Recipes
+
+
+@transaction.atomic
+def add_recipes(model, author_id, recipe_ids):
+    """Добавляет рецепты в избранное или список покупок одним INSERT.
+
+    bulk_create() не вызывает сигналы, поэтому счётчики избранного и
+    итоги списка покупок изменяются здесь на те же приращения, что и
+    при добавлении по одному. Если рецепт параллельно добавлен другим
+    запросом, INSERT завершится IntegrityError и ничего не изменится.
+
+    Возвращает множества id: добавленных, уже добавленных ранее и
+    несуществующих рецептов.
+    """
+    found = set(Recipes.objects.filter(
+        pk__in=recipe_ids).values_list('pk', flat=True))
+    existing = set(model.objects.filter(
+        author_id=author_id, recipe_id__in=found
+    ).values_list('recipe_id', flat=True))
+    added = found - existing
+    if added:
+        model.objects.bulk_create(
+            model(author_id=author_id, recipe_id=id) for id in added)
+        if model is Favorite:
+            Recipes.objects.filter(pk__in=added).update(
+                favorites_count=F('favorites_count') + 1)
+        else:
+            shopping_list.apply_amounts(
+                [author_id], shopping_list.recipes_amounts(added))
+    return added, existing, set(recipe_ids) - found
+
+
+@transaction.atomic
+def remove_recipes(model, author_id, recipe_ids):
+    """Удаляет рецепты из избранного или списка покупок.
+
+    Счётчики и итоги изменяют обработчики сигналов удаления, как и при
+    удалении по одному. Возвращает множество id удалённых рецептов.
+    """
+    rows = model.objects.filter(author_id=author_id, recipe_id__in=recipe_ids)
+    removed = set(rows.values_list('recipe_id', flat=True))
+    if removed:
+        rows.delete()
+    return removed
@@ -0,0 +1,64 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_KEY = 'version:{}'
+
+
+def peek_version(name):
+    """Версия набора данных из кэша или None, если её там нет."""
+    return cache.get(VERSION_KEY.format(name))
+
+
+def get_version(name):
+    """Текущая версия набора данных: время последнего изменения.
+
+    Если версия истекла или вытеснена из кэша, она создаётся заново
+    текущим временем, поэтому ответы, закэшированные с прежними
+    версиями, больше не отдаются.
+    """
+    version = peek_version(name)
+    if version is None:
+        version = time.time()
+        if not add_version(name, version):
+            version = peek_version(name) or version
+    return version
+
+
+def add_version(name, version):
+    """Записывает версию, если её нет в кэше; False, если она уже есть."""
+    return cache.add(VERSION_KEY.format(name), version, version_timeout())
+
+
+def version_timeout():
+    """Срок хранения версии, вдвое больше срока кэшей, где она в ключе.
+
+    Ключи версий не копятся в кэше бесконечно, а пока ответ с версией
+    в ключе не истёк, его версия обычно ещё хранится.
+    """
+    return 2 * max(
+        settings.RECIPE_CACHE_TIMEOUT,
+        settings.REFERENCE_CACHE_TIMEOUT,
+        settings.INGREDIENT_AUTOCOMPLETE_TTL,
+    )
+
+
+def bump_version(name):
+    """Сбрасывает все кэши, ключи которых содержат версию набора."""
+    version = time.time()
+    cache.set(VERSION_KEY.format(name), version, version_timeout())
+    return version
+
+
+def recipe_version_name(recipe_id):
+    return f'recipe:{recipe_id}'
+
+
+def bump_recipe_versions(recipe_ids):
+    """Сбрасывает кэш ответов по рецептам с указанными id."""
+    version = time.time()
+    cache.set_many({
+        VERSION_KEY.format(recipe_version_name(recipe_id)): version
+        for recipe_id in recipe_ids
+    }, version_timeout())
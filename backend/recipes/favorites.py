@@ -0,0 +1,18 @@
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Favorite, Recipes
+
+
+def refresh_favorites_count(recipe_ids=None):
+    """Пересчитывает favorites_count по таблице Favorite.
+
+    Нужен после массовых операций, которые не вызывают сигналы.
+    """
+    recipes = Recipes.objects.all()
+    if recipe_ids is not None:
+        recipes = recipes.filter(pk__in=recipe_ids)
+    recipes.update(favorites_count=Coalesce(Subquery(
+        Favorite.objects.filter(recipe=OuterRef('pk')).order_by().values(
+            'recipe').annotate(total=Count('id')).values('total')
+    ), 0))
@@ -0,0 +1,178 @@
+import heapq
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django_redis.cache import RedisCache
+from users.models import Subscriber, User
+
+from .models import Recipes
+
+TIMELINE_KEY = 'feed:{}'
+# Элемент сортированного множества ленты в Redis, отмечающий, что лента
+# собрана из базы полностью; его оценка больше, чем у любого рецепта.
+COMPLETE = b'complete'
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def position(pub_date, recipe_id):
+    """Позиция рецепта в ленте: время публикации в микросекундах и id."""
+    return (pub_date - EPOCH) // MICROSECOND, recipe_id
+
+
+def recipes_before(author_ids, before, count):
+    """Позиции count последних рецептов авторов, старше позиции before."""
+    recipes = Recipes.objects.filter(author_id__in=author_ids)
+    if before is not None:
+        pub_date = EPOCH + before[0] * MICROSECOND
+        recipes = recipes.filter(
+            Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, id__lt=before[1]))
+    return [
+        position(pub_date, recipe_id)
+        for pub_date, recipe_id in recipes.order_by(
+            '-pub_date', '-id').values_list('pub_date', 'id')[:count]
+    ]
+
+
+def popular_authors(user_id):
+    """Авторы из подписок, у которых больше FEED_FANOUT_LIMIT подписчиков.
+
+    Их рецепты не рассылаются по лентам и читаются из базы при каждом
+    запросе ленты. Число подписчиков хранится в User.followers_count.
+    """
+    return list(Subscriber.objects.filter(
+        user_id=user_id,
+        author__followers_count__gt=settings.FEED_FANOUT_LIMIT,
+    ).values_list('author_id', flat=True))
+
+
+def refresh_followers_count(user_ids=None):
+    """Пересчитывает followers_count по таблице Subscriber.
+
+    Нужен после массовых операций, которые не вызывают сигналы.
+    """
+    users = User.objects.all()
+    if user_ids is not None:
+        users = users.filter(pk__in=user_ids)
+    users.update(followers_count=Coalesce(Subquery(
+        Subscriber.objects.filter(author=OuterRef('pk')).order_by().values(
+            'author').annotate(total=Count('id')).values('total')
+    ), 0))
+
+
+def redis_client():
+    """Клиент Redis, если кэш хранится в Redis, иначе None."""
+    backend = caches['default']
+    if isinstance(backend, RedisCache):
+        return backend.client.get_client()
+    return None
+
+
+def stored_timeline(user_id, popular):
+    """Позиции ленты пользователя, собранные из базы."""
+    authors = Subscriber.objects.filter(user_id=user_id).exclude(
+        author_id__in=popular).values('author_id')
+    return recipes_before(authors, None, settings.FEED_SIZE)
+
+
+def get_timeline(user_id, popular):
+    """Сохранённая лента пользователя без рецептов популярных авторов.
+
+    В Redis лента хранится сортированным множеством id рецептов с
+    временем публикации в качестве оценки. Лента из базы добавляется
+    к множеству, а не заменяет его, поэтому рецепты, разосланные
+    во время её сборки, не теряются.
+    """
+    key = TIMELINE_KEY.format(user_id)
+    client = redis_client()
+    if client is None:
+        timeline = cache.get(key)
+        if timeline is None:
+            timeline = stored_timeline(user_id, popular)
+            cache.set(key, timeline, settings.FEED_TIMEOUT)
+        return timeline
+    key = cache.make_key(key)
+    items = client.zrevrange(key, 0, -1, withscores=True)
+    if not items or items[0][0] != COMPLETE:
+        pipeline = client.pipeline()
+        pipeline.zadd(key, {
+            COMPLETE: float('inf'),
+            **{recipe_id: microseconds for microseconds, recipe_id
+               in stored_timeline(user_id, popular)},
+        })
+        trim_timeline(pipeline, key)
+        pipeline.zrevrange(key, 0, -1, withscores=True)
+        items = pipeline.execute()[-1]
+    return sorted(
+        ((int(score), int(member)) for member, score in items[1:]),
+        reverse=True,
+    )
+
+
+def trim_timeline(pipeline, key):
+    """Оставляет FEED_SIZE новых рецептов ленты и продлевает её срок."""
+    pipeline.zremrangebyrank(key, 0, -(settings.FEED_SIZE + 2))
+    pipeline.expire(key, settings.FEED_TIMEOUT)
+
+
+def feed_positions(user_id, before, count):
+    """До count позиций ленты пользователя, старше позиции before.
+
+    Лента собирается из сохранённой ленты и рецептов популярных
+    авторов. Если сохранённая лента закончилась, а в базе могут быть
+    более старые рецепты, они читаются из базы.
+    """
+    popular = popular_authors(user_id)
+    timeline = get_timeline(user_id, popular)
+    stored = [item for item in timeline if before is None or item < before]
+    if len(stored) < count and len(timeline) >= settings.FEED_SIZE:
+        authors = Subscriber.objects.filter(user_id=user_id).exclude(
+            author_id__in=popular).values('author_id')
+        stored = recipes_before(authors, before, count)
+    merged = heapq.merge(
+        stored, recipes_before(popular, before, count), reverse=True)
+    seen = set()
+    return list(islice(
+        (item for item in merged
+         if item[1] not in seen and not seen.add(item[1])),
+        count
+    ))
+
+
+def push_recipe(recipe):
+    """Добавляет новый рецепт в сохранённые ленты подписчиков автора.
+
+    В Redis рецепт добавляется в ленты командой ZADD, поэтому
+    одновременные рассылки не затирают друг друга; лента, ещё не
+    собранная из базы, дособерётся при чтении. Без Redis ленты
+    подписчиков сбрасываются и собираются из базы заново. У автора
+    с числом подписчиков больше FEED_FANOUT_LIMIT рассылка не делается.
+    """
+    followers_count = User.objects.filter(pk=recipe.author_id).values_list(
+        'followers_count', flat=True).first()
+    if not followers_count or followers_count > settings.FEED_FANOUT_LIMIT:
+        return
+    keys = [
+        TIMELINE_KEY.format(user_id)
+        for user_id in Subscriber.objects.filter(
+            author_id=recipe.author_id).values_list('user_id', flat=True)
+    ]
+    client = redis_client()
+    if client is None:
+        cache.delete_many(keys)
+        return
+    microseconds, recipe_id = position(recipe.pub_date, recipe.id)
+    pipeline = client.pipeline()
+    for key in keys:
+        key = cache.make_key(key)
+        pipeline.zadd(key, {recipe_id: microseconds})
+        trim_timeline(pipeline, key)
+    pipeline.execute()
+
+
+def reset_timeline(user_id):
+    cache.delete(TIMELINE_KEY.format(user_id))
@@ -0,0 +1,113 @@
+import hashlib
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+from PIL import Image, features
+
+from .cache import bump_recipe_versions
+from .models import Recipes
+
+logger = logging.getLogger(__name__)
+
+# Наибольшая сторона уменьшенной копии изображения в пикселях.
+IMAGE_VARIANTS = {
+    'small': 240,
+    'medium': 480,
+}
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_WORKERS, thread_name_prefix='recipe-images')
+
+
+def variant_format():
+    if features.check('webp'):
+        return 'WEBP', 'webp'
+    return 'JPEG', 'jpg'
+
+
+def make_variants(image):
+    """Сохраняет уменьшенные копии и возвращает словарь их имён.
+
+    Имена файлов строятся из хэша содержимого исходного изображения,
+    поэтому повторная обработка того же файла не создаёт новых копий.
+    """
+    image.open('rb')
+    try:
+        content = image.read()
+    finally:
+        image.close()
+    digest = hashlib.sha256(content).hexdigest()[:32]
+    image_format, extension = variant_format()
+    variants = {'source': image.name}
+    with Image.open(io.BytesIO(content)) as source:
+        source = source.convert('RGB')
+        for variant, size in IMAGE_VARIANTS.items():
+            name = f'recipes/{digest}_{size}.{extension}'
+            if not default_storage.exists(name):
+                resized = source.copy()
+                resized.thumbnail((size, size), Image.LANCZOS)
+                buffer = io.BytesIO()
+                resized.save(buffer, image_format, quality=80)
+                default_storage.save(name, ContentFile(buffer.getvalue()))
+            variants[variant] = name
+    return variants
+
+
+def save_recipe_image(name, image):
+    """Записывает файл изображения под заранее выбранным именем name.
+
+    Если хранилище сохранило файл под другим именем (файл с таким
+    именем появился после выбора), рецепт переводится на новое имя.
+    Имена изображений из base64 случайные (uuid4), поэтому по name
+    находится только рецепт, для которого его выбрали. update() не
+    вызывает сигналы, поэтому кэш ответов по рецепту сбрасывается здесь.
+    """
+    saved = default_storage.save(name, image)
+    if saved != name:
+        logger.warning(
+            'Изображение рецепта %s сохранено под именем %s', name, saved)
+        recipes = Recipes.objects.filter(image=name)
+        recipe_ids = list(recipes.values_list('pk', flat=True))
+        recipes.update(image=saved)
+        bump_recipe_versions(recipe_ids)
+    return saved
+
+
+def update_variants(recipe_id):
+    """Обновляет копии изображения рецепта, если они устарели."""
+    recipe = Recipes.objects.filter(pk=recipe_id).only(
+        'image', 'image_variants').first()
+    if recipe is None or not recipe.image:
+        return
+    if recipe.image_variants.get('source') == recipe.image.name:
+        return
+    variants = make_variants(recipe.image)
+    if Recipes.objects.filter(pk=recipe_id, image=recipe.image.name).update(
+            image_variants=variants):
+        bump_recipe_versions([recipe_id])
+
+
+def update_variants_in_background(recipe_id):
+    def task():
+        try:
+            update_variants(recipe_id)
+        except Exception:
+            logger.exception(
+                'Не удалось обработать изображение рецепта %s', recipe_id)
+        finally:
+            close_old_connections()
+
+    executor.submit(task)
+
+
+def get_variant_name(recipe, variant):
+    """Имя уменьшенной копии или None, если она ещё не готова."""
+    variants = recipe.image_variants
+    if variants.get('source') != recipe.image.name:
+        return None
+    return variants.get(variant)
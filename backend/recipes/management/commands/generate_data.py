@@ -0,0 +1,166 @@
+import io
+import os
+import random
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from PIL import Image
+from recipes import shopping_list
+from recipes.cache import bump_version
+from recipes.favorites import refresh_favorites_count
+from recipes.feed import refresh_followers_count
+from recipes.management.commands.import_csv import read_csv
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipes,
+                            ShopCart, Tags)
+from recipes.search import update_search_vectors
+from users.models import Subscriber, User
+
+IMAGE_NAME = 'recipes/synthetic.png'
+PASSWORD = 'synthetic-password'
+TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#8fce00', 'lunch'),
+    ('Ужин', '#674ea7', 'dinner'),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполнение базы синтетическими данными для замеров '
+        'производительности: пользователи, рецепты, избранное, '
+        'списки покупок и подписки'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument(
+            '--ingredients', type=int, default=2000,
+            help='Ингредиенты берутся из data/ingredients.csv')
+        parser.add_argument(
+            '--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument(
+            '--favorites', type=int, default=10,
+            help='Рецептов в избранном у каждого пользователя')
+        parser.add_argument(
+            '--carts', type=int, default=5,
+            help='Рецептов в списке покупок у каждого пользователя')
+        parser.add_argument(
+            '--subscriptions', type=int, default=5,
+            help='Подписок у каждого пользователя')
+        parser.add_argument('--seed', type=int, default=0)
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        ingredients = self.create_ingredients(options['ingredients'])
+        tags = self.create_tags()
+        users = self.create_users(options['users'])
+        recipes = self.create_recipes(
+            rng, users, tags, ingredients, options['recipes'],
+            options['ingredients_per_recipe'])
+        for model, per_user in (
+            (Favorite, options['favorites']),
+            (ShopCart, options['carts']),
+        ):
+            model.objects.bulk_create((
+                model(author=user, recipe_id=recipe_id)
+                for user in users
+                for recipe_id in rng.sample(
+                    recipes, min(per_user, len(recipes)))
+            ), ignore_conflicts=True)
+        Subscriber.objects.bulk_create((
+            Subscriber(user=user, author=author)
+            for user in users
+            for author in rng.sample(
+                users, min(options['subscriptions'], len(users)))
+            if author != user
+        ), ignore_conflicts=True)
+        refresh_favorites_count()
+        refresh_followers_count()
+        shopping_list.rebuild()
+        update_search_vectors()
+        bump_version('ingredients')
+        bump_version('tags')
+        self.stdout.write(self.style.SUCCESS(
+            f'Пользователей: {len(users)}, рецептов: {len(recipes)}, '
+            f'ингредиентов: {len(ingredients)}'
+        ))
+
+    def create_ingredients(self, count):
+        path = os.path.join(settings.BASE_DIR, 'data', 'ingredients.csv')
+        with open(path, encoding='utf-8') as file:
+            rows = list(islice(read_csv(file), count))
+        rows += [
+            (f'ингредиент {number}', 'г')
+            for number in range(len(rows), count)
+        ]
+        Ingredient.objects.bulk_create((
+            Ingredient(name=name, measurement_unit=unit)
+            for name, unit in rows
+        ), ignore_conflicts=True)
+        return list(Ingredient.objects.values_list('id', flat=True)[:count])
+
+    def create_tags(self):
+        for name, color, slug in TAGS:
+            Tags.objects.get_or_create(
+                slug=slug, defaults={'name': name, 'color': color})
+        return list(Tags.objects.values_list('id', flat=True))
+
+    def create_users(self, count):
+        first_id = (User.objects.order_by('-id').values_list(
+            'id', flat=True).first() or 0) + 1
+        password = make_password(PASSWORD)
+        User.objects.bulk_create(
+            User(
+                email=f'synthetic{number}@example.com',
+                username=f'synthetic{number}',
+                first_name='Имя',
+                last_name='Фамилия',
+                password=password,
+            )
+            for number in range(first_id, first_id + count)
+        )
+        return list(User.objects.filter(
+            username__startswith='synthetic'))
+
+    def create_recipes(self, rng, users, tags, ingredients, count,
+                       ingredients_per_recipe):
+        if not default_storage.exists(IMAGE_NAME):
+            buffer = io.BytesIO()
+            Image.new('RGB', (600, 400), 'orange').save(buffer, 'PNG')
+            default_storage.save(IMAGE_NAME, ContentFile(buffer.getvalue()))
+        created = Recipes.objects.bulk_create(
+            Recipes(
+                author=rng.choice(users),
+                name=f'Рецепт {number}',
+                text='Синтетический рецепт для замеров производительности',
+                cooking_time=rng.randint(1, 180),
+                image=IMAGE_NAME,
+            )
+            for number in range(count)
+        )
+        if not created or created[0].pk is None:
+            created = Recipes.objects.order_by('-id')[:count]
+        recipe_ids = [recipe.pk for recipe in created]
+        Recipes.tags.through.objects.bulk_create(
+            Recipes.tags.through(recipes_id=recipe_id, tags_id=tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in rng.sample(tags, rng.randint(1, len(tags)))
+        )
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(
+                recipe_id=recipe_id,
+                ingredient_id=ingredient_id,
+                amount=rng.randint(1, 500),
+            )
+            for recipe_id in recipe_ids
+            for ingredient_id in rng.sample(
+                ingredients, min(ingredients_per_recipe, len(ingredients)))
+        )
+        return recipe_ids
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from recipes.images import update_variants
+from recipes.models import Recipes
+
+
+class Command(BaseCommand):
+    help = 'Создание уменьшенных копий изображений для существующих рецептов'
+
+    def handle(self, *args, **options):
+        processed = 0
+        recipe_ids = Recipes.objects.exclude(image='').values_list(
+            'id', flat=True)
+        for recipe_id in recipe_ids.iterator():
+            update_variants(recipe_id)
+            processed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано рецептов: {processed}'))
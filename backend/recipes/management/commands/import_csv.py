@@ -1,32 +1,90 @@
 import csv
+import json
 import os
+import time
+from itertools import islice
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from recipes.cache import bump_version
 from recipes.models import Ingredient
 
+CSV_HEADER = ['name', 'measurement_unit']
+DEFAULT_BATCH_SIZE = 1000
 
-def ingredient_create(row):
-    Ingredient.objects.get_or_create(
-        name=row[0],
-        measurement_unit=row[1],
-    )
 
+def read_csv(file):
+    reader = csv.reader(file)
+    for num, row in enumerate(reader):
+        if num == 0 and row == CSV_HEADER:
+            continue
+        yield row[0], row[1]
 
-action = {
-    "ingredients.csv": ingredient_create,
+
+def read_json(file):
+    for item in json.load(file):
+        yield item['name'], item['measurement_unit']
+
+
+readers = {
+    '.csv': read_csv,
+    '.json': read_json,
 }
 
 
+def batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
 class Command(BaseCommand):
+    help = 'Загрузка ингредиентов из файлов csv и json в каталоге data/'
+
     def add_arguments(self, parser):
         parser.add_argument("filename", nargs="+", type=str)
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Количество строк в одном INSERT",
+        )
 
     def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size должен быть больше нуля")
         for filename in options["filename"]:
-            path = os.path.join(settings.BASE_DIR, "data/") + filename
-            with open(path, "r", encoding="utf-8") as file:
-                reader = csv.reader(file)
-                next(reader)
-                for row in reader:
-                    action[filename](row)
+            self.load(filename, options["batch_size"])
+
+    def load(self, filename, batch_size):
+        """Загружает файл пачками, пропуская уже существующие записи."""
+        reader = readers.get(os.path.splitext(filename)[1])
+        if reader is None:
+            raise CommandError(f"Неподдерживаемый формат файла: {filename}")
+        path = os.path.join(settings.BASE_DIR, "data", filename)
+        rows = 0
+        started = time.monotonic()
+        with open(path, "r", encoding="utf-8") as file, transaction.atomic():
+            count_before = Ingredient.objects.count()
+            for batch in batches(reader(file), batch_size):
+                rows += len(batch)
+                Ingredient.objects.bulk_create(
+                    (
+                        Ingredient(name=name, measurement_unit=unit)
+                        for name, unit in dict.fromkeys(batch)
+                    ),
+                    batch_size=batch_size,
+                    ignore_conflicts=True,
+                )
+            created = Ingredient.objects.count() - count_before
+        bump_version('ingredients')
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{filename}: строк {rows}, добавлено {created}, "
+            f"дубликатов {rows - created}, "
+            f"{rows / elapsed if elapsed else rows:.0f} строк/с"
+        ))
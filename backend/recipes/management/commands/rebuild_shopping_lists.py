@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from recipes import shopping_list
+
+
+class Command(BaseCommand):
+    help = ('Проверка итогов списков покупок и их пересборка '
+            'по ShopCart и IngredientRecipe')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Только сообщить о расхождениях, не изменяя данные')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        expected = shopping_list.expected_totals()
+        current = shopping_list.current_totals()
+        mismatched = {
+            key for key in expected.keys() | current.keys()
+            if expected.get(key) != current.get(key)
+        }
+        authors = {author_id for author_id, _ in mismatched}
+        self.stdout.write(
+            f'Строк: {len(expected)}, расхождений: {len(mismatched)}, '
+            f'пользователей с расхождениями: {len(authors)}'
+        )
+        if options['check']:
+            if mismatched:
+                raise CommandError('Итоги списков покупок расходятся')
+            return
+        shopping_list.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Итоги пересобраны'))
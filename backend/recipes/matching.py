@@ -0,0 +1,29 @@
+from django.db.models import Count, F, FloatField, Q
+from django.db.models.functions import Cast
+
+from .models import IngredientRecipe, Recipes
+
+
+def match_recipes(ingredient_ids):
+    """Рецепты, в которых есть хотя бы один из ингредиентов.
+
+    Для каждого рецепта в одном сгруппированном запросе считаются
+    matched — число совпавших ингредиентов, missing — число недостающих
+    и coverage — доля совпавших. Сначала идут рецепты с большей долей
+    совпадений и меньшим числом недостающих ингредиентов.
+    """
+    return Recipes.objects.filter(
+        pk__in=IngredientRecipe.objects.filter(
+            ingredient_id__in=ingredient_ids).values('recipe_id')
+    ).defer('search_vector').annotate(
+        matched=Count(
+            'ingredient_list',
+            filter=Q(ingredient_list__ingredient_id__in=ingredient_ids),
+        ),
+        total=Count('ingredient_list'),
+    ).annotate(
+        missing=F('total') - F('matched'),
+        coverage=(
+            Cast('matched', FloatField()) / Cast('total', FloatField())
+        ),
+    ).order_by('-coverage', 'missing', '-pub_date', '-id')
@@ -0,0 +1,56 @@
+# Generated by Django 3.2.3 on 2026-10-18 19:01
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Sum
+
+
+def fill_shop_cart_ingredients(apps, schema_editor):
+    IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+    ShopCartIngredient = apps.get_model('recipes', 'ShopCartIngredient')
+    ShopCartIngredient.objects.bulk_create(
+        (
+            ShopCartIngredient(
+                author_id=row['recipe__shop__author'],
+                ingredient_id=row['ingredient'],
+                amount=row['total'],
+            )
+            for row in IngredientRecipe.objects.filter(
+                recipe__shop__isnull=False
+            ).values('recipe__shop__author', 'ingredient').annotate(
+                total=Sum('amount')).order_by()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0006_recipes_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShopCartIngredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.IntegerField(verbose_name='Количество')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shop_ingredients', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shop_ingredients', to='recipes.ingredient', verbose_name='Ингредиент')),
+            ],
+            options={
+                'verbose_name': 'Итог списка покупок',
+                'verbose_name_plural': 'Итоги списков покупок',
+                'default_related_name': 'shop_ingredients',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shopcartingredient',
+            constraint=models.UniqueConstraint(fields=('author', 'ingredient'), name='unique_shop_cart_ingredient'),
+        ),
+        migrations.RunPython(
+            fill_shop_cart_ingredients, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 3.2.3 on 2026-10-18 19:03
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+INDEX_NAME = 'recipes_recipes_search_vector'
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Recipes = apps.get_model('recipes', 'Recipes')
+    IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+    ingredient_names = Subquery(
+        IngredientRecipe.objects.filter(recipe=OuterRef('pk')).order_by()
+        .values('recipe').annotate(
+            names=StringAgg('ingredient__name', ' ')).values('names')
+    )
+    config = settings.SEARCH_CONFIG
+    Recipes.objects.update(search_vector=(
+        SearchVector('name', weight='A', config=config)
+        + SearchVector(ingredient_names, weight='B', config=config)
+        + SearchVector('text', weight='C', config=config)
+    ))
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} '
+        f'ON {Recipes._meta.db_table} USING gin (search_vector)'
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+    """Поисковый вектор рецептов и GIN-индекс по нему.
+
+    Индекс и заполнение вектора нужны только на PostgreSQL.
+    """
+
+    dependencies = [
+        ('recipes', '0007_shop_cart_ingredient'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipes',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
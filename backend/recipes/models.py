@@ -1,3 +1,4 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from users.models import User
@@ -21,6 +22,10 @@ class Ingredient(models.Model):
         ordering = ('name',)
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        constraints = [models.UniqueConstraint(
+            fields=['name', 'measurement_unit'],
+            name='unique_ingredient_measurement_unit')
+        ]
 
     def __str__(self):
         return self.name
@@ -101,15 +106,37 @@ class Recipes(models.Model):
         upload_to='recipes/',
         verbose_name='Изображение рецепта'
     )
+    image_variants = models.JSONField(
+        verbose_name='Уменьшенные копии изображения',
+        default=dict,
+        editable=False,
+    )
     pub_date = models.DateTimeField(
         verbose_name='Дата публикации',
         auto_now_add=True,
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном',
+        default=0,
+        editable=False,
+    )
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True,
+        editable=False,
+    )
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='recipe_pub_date_id_idx'),
+            models.Index(
+                fields=['author', '-pub_date'],
+                name='recipe_author_pub_date_idx'),
+        ]
 
 
 class IngredientRecipe(models.Model):
@@ -139,6 +166,11 @@ class IngredientRecipe(models.Model):
         constraints = [models.UniqueConstraint(
             fields=['ingredient', 'recipe'], name='recipe_ingredient_unique')
         ]
+        indexes = [
+            models.Index(
+                fields=['recipe', 'ingredient'],
+                name='ingredientrecipe_recipe_idx'),
+        ]
 
 
 class BaseModel(models.Model):
@@ -157,13 +189,13 @@ class BaseModel(models.Model):
     class Meta:
         abstract = True
         constraints = [models.UniqueConstraint(
-            fields=['author', 'recipe'], name='unique_%(model_name)s')]
+            fields=['author', 'recipe'], name='unique_%(class)s')]
 
 
 class ShopCart(BaseModel):
     """Список покупок"""
 
-    class Meta:
+    class Meta(BaseModel.Meta):
         default_related_name = 'shop'
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Список покупок'
@@ -172,7 +204,35 @@ class ShopCart(BaseModel):
 class Favorite(BaseModel):
     """Избранное"""
 
-    class Meta:
+    class Meta(BaseModel.Meta):
         default_related_name = 'favorite'
         verbose_name = 'Избранное'
         verbose_name_plural = 'Избранное'
+
+
+class ShopCartIngredient(models.Model):
+    """Суммарное количество ингредиента в списке покупок пользователя.
+
+    Поддерживается при изменении списка покупок и ингредиентов рецептов,
+    пересобирается командой rebuild_shopping_lists.
+    """
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент',
+    )
+    amount = models.IntegerField(verbose_name='Количество')
+
+    class Meta:
+        default_related_name = 'shop_ingredients'
+        verbose_name = 'Итог списка покупок'
+        verbose_name_plural = 'Итоги списков покупок'
+        constraints = [models.UniqueConstraint(
+            fields=['author', 'ingredient'],
+            name='unique_shop_cart_ingredient')
+        ]
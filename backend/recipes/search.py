@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connections
+from django.db.models import (Case, Exists, F, IntegerField, OuterRef, Q,
+                              Subquery, Value, When)
+
+from .models import IngredientRecipe, Recipes
+
+
+def is_postgresql(queryset):
+    return connections[queryset.db].vendor == 'postgresql'
+
+
+def search_vector():
+    """Название рецепта важнее ингредиентов, ингредиенты важнее описания."""
+    ingredient_names = Subquery(
+        IngredientRecipe.objects.filter(recipe=OuterRef('pk')).order_by()
+        .values('recipe').annotate(
+            names=StringAgg('ingredient__name', ' ')).values('names')
+    )
+    config = settings.SEARCH_CONFIG
+    return (
+        SearchVector('name', weight='A', config=config)
+        + SearchVector(ingredient_names, weight='B', config=config)
+        + SearchVector('text', weight='C', config=config)
+    )
+
+
+def update_search_vectors(recipe_ids=None):
+    """Пересчитывает search_vector; на других СУБД ничего не делает."""
+    recipes = Recipes.objects.all()
+    if not is_postgresql(recipes):
+        return
+    if recipe_ids is not None:
+        recipes = recipes.filter(pk__in=recipe_ids)
+    recipes.update(search_vector=search_vector())
+
+
+def search_recipes(queryset, value):
+    """Рецепты, подходящие под запрос, от более релевантных к менее.
+
+    На PostgreSQL используется полнотекстовый поиск по search_vector,
+    на других СУБД — поиск подстроки в названии, описании и названиях
+    ингредиентов, где совпадения в названии идут первыми.
+    """
+    if is_postgresql(queryset):
+        query = SearchQuery(
+            value, config=settings.SEARCH_CONFIG, search_type='websearch')
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by('-rank', '-pub_date', '-id')
+    in_ingredients = Exists(IngredientRecipe.objects.filter(
+        recipe=OuterRef('pk'), ingredient__name__icontains=value))
+    return queryset.filter(
+        Q(name__icontains=value) | Q(text__icontains=value) | in_ingredients
+    ).annotate(
+        rank=Case(
+            When(name__icontains=value, then=Value(0)),
+            default=Value(1),
+            output_field=IntegerField(),
+        )
+    ).order_by('rank', '-pub_date', '-id')
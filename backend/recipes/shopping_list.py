@@ -0,0 +1,121 @@
+from django.db.models import Case, F, Sum, Value, When
+
+from .models import IngredientRecipe, ShopCart, ShopCartIngredient
+
+
+def recipe_amounts(recipe_id):
+    return dict(IngredientRecipe.objects.filter(
+        recipe_id=recipe_id).values_list('ingredient_id', 'amount'))
+
+
+def apply_amounts(author_ids, amounts):
+    """Прибавляет amounts {id ингредиента: количество} к итогам авторов.
+
+    Недостающие строки сначала создаются с нулём, поэтому изменение
+    выполняется одним UPDATE с F() и не теряется при параллельных
+    запросах. Строки с нулевым итогом удаляются.
+    """
+    amounts = {id: amount for id, amount in amounts.items() if amount}
+    if not author_ids or not amounts:
+        return
+    ShopCartIngredient.objects.bulk_create(
+        (
+            ShopCartIngredient(
+                author_id=author_id, ingredient_id=ingredient_id, amount=0)
+            for author_id in author_ids
+            for ingredient_id in amounts
+        ),
+        ignore_conflicts=True,
+    )
+    rows = ShopCartIngredient.objects.filter(
+        author_id__in=author_ids, ingredient_id__in=amounts)
+    rows.update(amount=F('amount') + Case(
+        *(When(ingredient_id=id, then=Value(amount))
+          for id, amount in amounts.items()),
+        default=Value(0),
+    ))
+    rows.filter(amount__lte=0).delete()
+
+
+def recipe_added(author_id, recipe_id):
+    apply_amounts([author_id], recipe_amounts(recipe_id))
+
+
+def recipe_removed(author_id, recipe_id):
+    apply_amounts([author_id], {
+        id: -amount for id, amount in recipe_amounts(recipe_id).items()
+    })
+
+
+def recipes_amounts(recipe_ids, sign=1):
+    """Суммарные количества ингредиентов рецептов, умноженные на sign."""
+    return {
+        ingredient_id: sign * total
+        for ingredient_id, total in IngredientRecipe.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values('ingredient').annotate(total=Sum('amount')).values_list(
+            'ingredient', 'total'
+        ).order_by()
+    }
+
+
+def recipe_ingredients_changed(recipe_id, amounts):
+    """Переносит изменения ингредиентов рецепта в итоги всех, у кого
+    рецепт в списке покупок."""
+    apply_amounts(
+        list(ShopCart.objects.filter(
+            recipe_id=recipe_id).values_list('author_id', flat=True)),
+        amounts,
+    )
+
+
+def expected_totals(author_ids=None):
+    """Итоги, посчитанные заново по ShopCart и IngredientRecipe.
+
+    Условие на автора задаётся в том же filter(), что и на наличие в
+    списке покупок: второй filter() по связи многие-ко-многим добавил бы
+    ещё одно соединение с ShopCart и умножил бы количества.
+    """
+    if author_ids is None:
+        ingredients = IngredientRecipe.objects.filter(
+            recipe__shop__isnull=False)
+    else:
+        ingredients = IngredientRecipe.objects.filter(
+            recipe__shop__author__in=author_ids)
+    return {
+        (author_id, ingredient_id): amount
+        for author_id, ingredient_id, amount in ingredients.values(
+            'recipe__shop__author', 'ingredient'
+        ).annotate(total=Sum('amount')).values_list(
+            'recipe__shop__author', 'ingredient', 'total'
+        ).order_by()
+    }
+
+
+def current_totals(author_ids=None):
+    rows = ShopCartIngredient.objects.all()
+    if author_ids is not None:
+        rows = rows.filter(author_id__in=author_ids)
+    return {
+        (author_id, ingredient_id): amount
+        for author_id, ingredient_id, amount in rows.values_list(
+            'author_id', 'ingredient_id', 'amount')
+    }
+
+
+def rebuild(author_ids=None, batch_size=1000):
+    """Пересобирает итоги с нуля, для всех или только для author_ids."""
+    rows = ShopCartIngredient.objects.all()
+    if author_ids is not None:
+        rows = rows.filter(author_id__in=author_ids)
+    rows.delete()
+    ShopCartIngredient.objects.bulk_create(
+        (
+            ShopCartIngredient(
+                author_id=author_id, ingredient_id=ingredient_id,
+                amount=amount)
+            for (author_id, ingredient_id), amount
+            in expected_totals(author_ids).items()
+        ),
+        batch_size=batch_size,
+    )
@@ -0,0 +1,125 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+from users.models import Subscriber, User
+
+from . import shopping_list
+from .cache import bump_recipe_versions, bump_version
+from .feed import push_recipe, reset_timeline
+from .images import get_variant_name, update_variants_in_background
+from .models import (Favorite, Ingredient, IngredientRecipe, Recipes,
+                     ShopCart, Tags)
+from .search import update_search_vectors
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredients_changed(**kwargs):
+    bump_version('ingredients')
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(instance, created, **kwargs):
+    if not created:
+        recipe_ids = list(instance.recipes.values_list('pk', flat=True))
+        transaction.on_commit(lambda: update_search_vectors(recipe_ids))
+        bump_recipes_on_commit(recipe_ids)
+
+
+@receiver((post_save, post_delete), sender=Tags)
+def tags_changed(**kwargs):
+    bump_version('tags')
+
+
+@receiver(post_save, sender=Favorite)
+def favorite_added(instance, created, **kwargs):
+    if created:
+        Recipes.objects.filter(pk=instance.recipe_id).update(
+            favorites_count=F('favorites_count') + 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def favorite_removed(instance, **kwargs):
+    Recipes.objects.filter(pk=instance.recipe_id).update(
+        favorites_count=F('favorites_count') - 1)
+
+
+@receiver(post_save, sender=ShopCart)
+def shop_cart_added(instance, created, **kwargs):
+    if created:
+        shopping_list.recipe_added(instance.author_id, instance.recipe_id)
+
+
+@receiver(pre_delete, sender=ShopCart)
+def shop_cart_removed(instance, **kwargs):
+    # pre_delete: при удалении рецепта его ингредиенты ещё не удалены
+    shopping_list.recipe_removed(instance.author_id, instance.recipe_id)
+
+
+@receiver(post_save, sender=Recipes)
+def recipe_saved(instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: push_recipe(instance))
+    # после фиксации транзакции ингредиенты рецепта уже сохранены
+    transaction.on_commit(lambda: update_search_vectors([instance.pk]))
+    if instance.image and get_variant_name(instance, 'small') is None:
+        transaction.on_commit(
+            lambda: update_variants_in_background(instance.pk))
+
+
+@receiver(post_save, sender=Subscriber)
+def subscription_added(instance, created, **kwargs):
+    if created:
+        User.objects.filter(pk=instance.author_id).update(
+            followers_count=F('followers_count') + 1)
+    reset_timeline(instance.user_id)
+
+
+@receiver(post_delete, sender=Subscriber)
+def subscription_removed(instance, **kwargs):
+    User.objects.filter(pk=instance.author_id).update(
+        followers_count=F('followers_count') - 1)
+    reset_timeline(instance.user_id)
+
+
+def bump_recipes_on_commit(recipe_ids):
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        transaction.on_commit(lambda: bump_recipe_versions(recipe_ids))
+
+
+@receiver((post_save, post_delete), sender=Recipes)
+def recipe_changed(instance, **kwargs):
+    bump_recipes_on_commit([instance.pk])
+
+
+@receiver((post_save, post_delete), sender=IngredientRecipe)
+def recipe_ingredient_changed(instance, **kwargs):
+    bump_recipes_on_commit([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipes.tags.through)
+def recipe_tags_changed(instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        bump_recipes_on_commit([instance.pk])
+    elif action == 'pre_clear':
+        bump_recipes_on_commit(
+            instance.recipe.values_list('pk', flat=True))
+    else:
+        bump_recipes_on_commit(pk_set)
+
+
+@receiver(post_save, sender=Tags)
+@receiver(pre_delete, sender=Tags)
+def tag_changed(instance, **kwargs):
+    bump_recipes_on_commit(instance.recipe.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=User)
+def author_changed(instance, created, update_fields, **kwargs):
+    if created or update_fields == frozenset(('last_login',)):
+        return
+    bump_recipes_on_commit(instance.recipe.values_list('pk', flat=True))
@@ -0,0 +1,55 @@
+import pytest
+from recipes import shopping_list
+from recipes.bulk import add_recipes, remove_recipes
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipes,
+                            ShopCart)
+from users.models import User
+
+
+@pytest.fixture
+def user():
+    return User.objects.create(username='user', email='user@example.org')
+
+
+@pytest.fixture
+def recipes(user):
+    ingredient = Ingredient.objects.create(name='Соль', measurement_unit='г')
+    recipes = [
+        Recipes.objects.create(
+            author=user, name=f'Рецепт {num}', text='Описание',
+            cooking_time=1, image='recipes/image.png',
+        )
+        for num in range(3)
+    ]
+    for recipe in recipes:
+        IngredientRecipe.objects.create(
+            recipe=recipe, ingredient=ingredient, amount=10)
+    return recipes
+
+
+@pytest.mark.django_db
+def test_favorites(user, recipes):
+    ids = [recipe.id for recipe in recipes]
+    Favorite.objects.create(author=user, recipe=recipes[0])
+    added, existing, missing = add_recipes(Favorite, user.id, ids + [0])
+    assert (added, existing, missing) == (set(ids[1:]), {ids[0]}, {0})
+    assert remove_recipes(Favorite, user.id, ids[:2] + [0]) == set(ids[:2])
+    assert list(Favorite.objects.values_list('recipe_id', flat=True)) == [
+        ids[2]]
+    assert dict(Recipes.objects.values_list('id', 'favorites_count')) == {
+        ids[0]: 0, ids[1]: 0, ids[2]: 1}
+
+
+@pytest.mark.django_db
+def test_shopping_cart_totals(user, recipes):
+    ids = [recipe.id for recipe in recipes]
+    other = User.objects.create(username='other', email='other@example.org')
+    ShopCart.objects.create(author=other, recipe=recipes[1])
+    add_recipes(ShopCart, user.id, ids)
+    assert shopping_list.current_totals([user.id]) == {
+        (user.id, recipes[0].ingredients.get().id): 30}
+    assert remove_recipes(ShopCart, user.id, ids[:1]) == {ids[0]}
+    assert not remove_recipes(ShopCart, user.id, ids[:1])
+    assert shopping_list.current_totals() == (
+        shopping_list.expected_totals())
+    assert sorted(shopping_list.current_totals().values()) == [10, 20]
@@ -0,0 +1,57 @@
+import pytest
+from django.core.cache import cache
+from django.test import override_settings
+from recipes.feed import feed_positions, popular_authors
+from recipes.models import Recipes
+from users.models import Subscriber, User
+
+
+def create_recipe(author, name):
+    return Recipes.objects.create(
+        author=author, name=name, text='Описание', cooking_time=1,
+        image='recipes/image.png',
+    )
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+@pytest.fixture
+def users():
+    return [
+        User.objects.create(username=f'user{num}', email=f'{num}@example.org')
+        for num in range(3)
+    ]
+
+
+@pytest.mark.django_db
+def test_followers_count(users):
+    reader, author, other = users
+    Subscriber.objects.create(user=reader, author=author)
+    Subscriber.objects.create(user=other, author=author)
+    Subscriber.objects.filter(user=other).delete()
+    author.refresh_from_db()
+    assert author.followers_count == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_new_recipe_appears_in_stored_timeline(users):
+    reader, author, _ = users
+    Subscriber.objects.create(user=reader, author=author)
+    old = create_recipe(author, 'Старый')
+    assert [id for _, id in feed_positions(reader.id, None, 10)] == [old.id]
+    new = create_recipe(author, 'Новый')
+    assert [id for _, id in feed_positions(reader.id, None, 10)] == [
+        new.id, old.id]
+
+
+@pytest.mark.django_db
+def test_popular_authors(users):
+    reader, author, other = users
+    Subscriber.objects.create(user=reader, author=author)
+    Subscriber.objects.create(user=other, author=author)
+    Subscriber.objects.create(user=reader, author=other)
+    with override_settings(FEED_FANOUT_LIMIT=1):
+        assert popular_authors(reader.id) == [author.id]
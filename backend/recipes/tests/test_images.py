@@ -0,0 +1,41 @@
+import pytest
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from recipes.cache import VERSION_KEY, recipe_version_name
+from recipes.images import save_recipe_image
+from recipes.models import Recipes
+from users.models import User
+
+IMAGE_NAME = 'recipes/image.png'
+
+
+@pytest.fixture
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    return tmp_path
+
+
+@pytest.mark.django_db
+def test_save_recipe_image_keeps_reserved_name(media_root):
+    assert save_recipe_image(IMAGE_NAME, ContentFile(b'image')) == IMAGE_NAME
+    assert default_storage.exists(IMAGE_NAME)
+
+
+@pytest.mark.django_db
+def test_save_recipe_image_repairs_renamed_file(media_root):
+    """Рецепт переводится на имя, под которым хранилище сохранило файл."""
+    author = User.objects.create(username='author', email='a@example.org')
+    recipe = Recipes.objects.create(
+        author=author, name='Рецепт', text='Описание', cooking_time=1,
+        image=IMAGE_NAME,
+    )
+    version_key = VERSION_KEY.format(recipe_version_name(recipe.id))
+    cache.delete(version_key)
+    default_storage.save(IMAGE_NAME, ContentFile(b'other'))
+    saved = save_recipe_image(IMAGE_NAME, ContentFile(b'image'))
+    assert saved != IMAGE_NAME
+    recipe.refresh_from_db()
+    assert recipe.image.name == saved
+    assert cache.get(version_key) is not None
+    assert default_storage.open(saved).read() == b'image'
@@ -0,0 +1,67 @@
+from types import SimpleNamespace
+
+import pytest
+from django.contrib.admin import site
+from recipes import shopping_list
+from recipes.admin import AdminRecipe
+from recipes.models import Ingredient, IngredientRecipe, Recipes, ShopCart
+from users.models import User
+
+
+@pytest.fixture
+def users():
+    return [
+        User.objects.create(username=name, email=f'{name}@example.org')
+        for name in ('a', 'b')
+    ]
+
+
+@pytest.fixture
+def ingredient():
+    return Ingredient.objects.create(name='Соль', measurement_unit='г')
+
+
+def create_recipe(author, ingredient, amount):
+    recipe = Recipes.objects.create(
+        author=author, name=f'Рецепт {amount}', text='Описание',
+        cooking_time=1, image='recipes/image.png',
+    )
+    IngredientRecipe.objects.create(
+        recipe=recipe, ingredient=ingredient, amount=amount)
+    return recipe
+
+
+@pytest.mark.django_db
+def test_rebuild_with_shared_recipe(users, ingredient):
+    first, second = users
+    shared = create_recipe(first, ingredient, 10)
+    own = create_recipe(first, ingredient, 1)
+    ShopCart.objects.create(author=first, recipe=shared)
+    ShopCart.objects.create(author=second, recipe=shared)
+    ShopCart.objects.create(author=first, recipe=own)
+    expected = {(first.id, ingredient.id): 11, (second.id, ingredient.id): 10}
+    assert shopping_list.current_totals() == expected
+    assert shopping_list.expected_totals([first.id]) == {
+        (first.id, ingredient.id): 11}
+    shopping_list.rebuild([first.id])
+    assert shopping_list.current_totals() == expected
+    shopping_list.rebuild()
+    assert shopping_list.current_totals() == expected
+
+
+@pytest.mark.django_db
+def test_admin_ingredient_change(users, ingredient):
+    first, second = users
+    recipe = create_recipe(first, ingredient, 10)
+    other = create_recipe(first, ingredient, 1)
+    ShopCart.objects.create(author=first, recipe=recipe)
+    ShopCart.objects.create(author=second, recipe=recipe)
+    ShopCart.objects.create(author=first, recipe=other)
+
+    def save_m2m():
+        recipe.ingredient_list.update(amount=15)
+
+    form = SimpleNamespace(instance=recipe, save_m2m=save_m2m)
+    AdminRecipe(Recipes, site).save_related(None, form, [], change=True)
+    assert shopping_list.current_totals() == {
+        (first.id, ingredient.id): 16, (second.id, ingredient.id): 15}
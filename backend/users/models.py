@@ -27,6 +27,11 @@ class User(AbstractUser):
         verbose_name='Фамилия',
         blank=False,
     )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Подписчиков',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         ordering = ['username']
@@ -3,6 +3,22 @@ from rest_framework.serializers import SerializerMethodField
 from users.models import Subscriber, User
 
 
+def get_subscribed_ids(request):
+    """Id авторов, на которых подписан текущий пользователь.
+
+    Множество загружается одним запросом и кэшируется на объекте запроса,
+    поэтому все сериализаторы одного ответа используют его повторно.
+    """
+    if request is None or request.user.is_anonymous:
+        return frozenset()
+    subscribed_ids = getattr(request, '_subscribed_ids', None)
+    if subscribed_ids is None:
+        subscribed_ids = set(Subscriber.objects.filter(
+            user=request.user).values_list('author_id', flat=True))
+        request._subscribed_ids = subscribed_ids
+    return subscribed_ids
+
+
 class CustomUserSerializer(UserSerializer):
     """Сериализатор для работы с информацией о пользователях."""
     is_subscribed = SerializerMethodField(read_only=True)
@@ -13,6 +29,4 @@ class CustomUserSerializer(UserSerializer):
                   'first_name', 'last_name', 'is_subscribed',)
 
     def get_is_subscribed(self, obj):
-        user = self.context.get('request').user
-        return not user.is_anonymous and Subscriber.objects.filter(
-            user=user, author=obj).exists()
+        return obj.id in get_subscribed_ids(self.context.get('request'))
@@ -0,0 +1,27 @@
+import warnings
+
+import pytest
+from django.core.paginator import UnorderedObjectListWarning
+from rest_framework.test import APIClient
+from users.models import Subscriber, User
+
+
+@pytest.mark.django_db
+def test_subscriptions_pages():
+    user = User.objects.create(username='reader', email='reader@example.org')
+    for num in (3, 1, 4, 2, 0):
+        author = User.objects.create(
+            username=f'author{num}', email=f'author{num}@example.org')
+        Subscriber.objects.create(user=user, author=author)
+    client = APIClient()
+    client.force_authenticate(user)
+    usernames = []
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', UnorderedObjectListWarning)
+        for page in (1, 2, 3):
+            response = client.get(
+                '/api/users/subscriptions/', {'limit': 2, 'page': page})
+            assert response.status_code == 200
+            usernames += [
+                author['username'] for author in response.data['results']]
+    assert usernames == [f'author{num}' for num in range(5)]
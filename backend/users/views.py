@@ -1,7 +1,10 @@
+from api.mixins import MetricsMixin, ReplicaReadMixin
 from api.pagination import CustomPagination
-from api.serializers import SubscribeSerializer
+from api.serializers import SubscribeSerializer, get_recipes_limit
+from django.db.models import Count, OuterRef, Prefetch, Subquery
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet
+from recipes.models import Recipes
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
@@ -11,7 +14,7 @@ from .models import Subscriber, User
 from .serializers import CustomUserSerializer
 
 
-class CustomUserViewSet(UserViewSet):
+class CustomUserViewSet(MetricsMixin, ReplicaReadMixin, UserViewSet):
     queryset = User.objects.all()
     serializer_class = CustomUserSerializer
     pagination_class = CustomPagination
@@ -57,8 +60,27 @@ class CustomUserViewSet(UserViewSet):
 
     @action(detail=False, permission_classes=[IsAuthenticated])
     def subscriptions(self, request):
+        """Авторы из подписок с числом рецептов и первыми recipes_limit.
+
+        Рецепты всех авторов страницы загружаются одним запросом: для
+        каждого автора подзапрос выбирает id его последних рецептов.
+        Запрос с GROUP BY не сортируется по Meta.ordering, поэтому порядок
+        для пагинации задаётся явно.
+        """
         user = request.user
-        queryset = User.objects.filter(following__user=user)
+        limit = get_recipes_limit(request)
+        recipes = Recipes.objects.all()
+        if limit is not None:
+            recipes = recipes.filter(pk__in=Subquery(
+                Recipes.objects.filter(
+                    author=OuterRef('author')
+                ).values('pk')[:limit]
+            ))
+        queryset = User.objects.filter(following__user=user).annotate(
+            recipes_count=Count('recipe', distinct=True)
+        ).order_by('username').prefetch_related(
+            Prefetch('recipe', queryset=recipes, to_attr='limited_recipes')
+        )
         pages = self.paginate_queryset(queryset)
         serializer = SubscribeSerializer(
             pages,